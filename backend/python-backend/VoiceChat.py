@@ -1,14 +1,11 @@
 
 import os
-from groq import Groq
-from openai import OpenAI
+from transcription import transcribe, transcribe_async
+from llm_clients import openai_client, async_openai_client
+from observability import get_logger, llm_call, record_usage
 import datetime
-# client = Groq(
-#     api_key=os.environ.get("GROQ_API_KEY"),
-# )
 
-
-client = Groq()
+log = get_logger("voicechat")
 
 
 
@@ -20,47 +17,99 @@ You are only suppose to answer in English, Hindi, Marathi, and other Indian lang
 """
 
 
-def get_text(filename):
-    with open(filename, "rb") as file:
-        transcription = client.audio.transcriptions.create(
-          file=(filename, file.read()),
-          model="whisper-large-v3-turbo",
-          response_format="verbose_json",
-        )
-        return transcription.text
+def get_text(source):
+    return transcribe(source)
+
+
+async def get_text_async(source):
+    return await transcribe_async(source)
         
 
+MODEL = "gpt-4o-mini"
 
-def get_response(prompt):
-  system = system_message
 
-  key = os.getenv("OPENAI_API_KEY")
+def response_messages(prompt):
+  system = system_message
 
-  MODEL="gpt-4o-mini"
-  client = OpenAI(api_key=key)
+  return [
+    {"role": "system", "content": system},
+    {"role": "user", "content": prompt},
+  ]
 
 
-  completion = client.chat.completions.create(
-    model=MODEL,
-    messages=[
-      {"role": "system", "content": system},
-      {"role": "user", "content": prompt},
-    ]
-  )
+def get_response(prompt):
+  with llm_call(MODEL):
+    completion = openai_client().chat.completions.create(
+      model=MODEL,
+      messages=response_messages(prompt),
+    )
+  record_usage(MODEL, completion)
   return(completion.choices[0].message.content) 
 
 
+async def get_response_async(prompt):
+  with llm_call(MODEL):
+    completion = await async_openai_client().chat.completions.create(
+      model=MODEL,
+      messages=response_messages(prompt),
+    )
+  record_usage(MODEL, completion)
+  return completion.choices[0].message.content
+
+
+def stream_response(prompt):
+  # Yields cleaned text deltas as the model produces them. The upstream span
+  # lasts until the last chunk, which carries the token usage.
+  with llm_call(MODEL):
+    stream = openai_client().chat.completions.create(
+      model=MODEL,
+      messages=response_messages(prompt),
+      stream=True,
+      stream_options={"include_usage": True},
+    )
+    for chunk in stream:
+      if chunk.usage is not None:
+        record_usage(MODEL, chunk)
+      if chunk.choices and chunk.choices[0].delta.content:
+        yield clean(chunk.choices[0].delta.content)
+
+
+async def stream_response_async(prompt):
+  with llm_call(MODEL):
+    stream = await async_openai_client().chat.completions.create(
+      model=MODEL,
+      messages=response_messages(prompt),
+      stream=True,
+      stream_options={"include_usage": True},
+    )
+    async for chunk in stream:
+      if chunk.usage is not None:
+        record_usage(MODEL, chunk)
+      if chunk.choices and chunk.choices[0].delta.content:
+        yield clean(chunk.choices[0].delta.content)
+
+
 def clean(data):
+    # Works on whole responses and on streamed deltas alike, "*" is one character
     data = data.replace("*", "")
     return data
 
 
-def VoiceChat(filename):
-    text = get_text(filename)
-    print(f"Text: {text}")
+def VoiceChat(source):
+    text = get_text(source)
+    log.debug("voicechat.transcript", text=text)
     result = get_response(text)
     result = clean(result)
-    print(f"Result: {result}")
+    log.debug("voicechat.response", result=result)
+    return result
+
+
+async def VoiceChat_async(source):
+    text = await get_text_async(source)
+    log.debug("voicechat.transcript", text=text)
+    result = await get_response_async(text)
+    result = clean(result)
+    log.debug("voicechat.response", result=result)
     return result
 
 
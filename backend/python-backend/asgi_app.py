@@ -0,0 +1,224 @@
+# Async serving mode: the same routes and payloads as app.py, served by an
+# ASGI server with non-blocking OpenAI/Groq clients, so one process can keep
+# many upstream LLM calls in flight instead of one per worker thread.
+#
+#   hypercorn asgi_app:app --bind 0.0.0.0:5000
+#   uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+import asyncio
+from quart import Quart, Response, request, jsonify, url_for
+from scan_food import scan_async, scan_batch_async
+from diet import generate_diet_async
+from chat import chat
+from VoiceChat import VoiceChat_async, get_text_async, stream_response_async
+from retreive_doctor_data import open_directory
+from streaming import stream_format, mimetype, encode_event, message_events_async
+from llm_clients import LLM_WARMUP, warm_up_async
+from observability import get_logger, instrument, render_metrics, METRICS_CONTENT_TYPE
+from jobs import get_job, wants_async
+from routes import (RequestError, error_body, close_uploads, diet_profile, chat_context,
+                    scan_img_input, scan_img_body, scan_img_result, scan_batch_input, scan_batch_body,
+                    scan_batch_result, audio_input, analyze_symptoms_input, analyze_symptoms_result, start_job,
+                    job_accepted, apply_bed_changes, doctors_page)
+
+app = Quart(__name__)
+instrument(app, request, is_async=True)
+log = get_logger("asgi_app")
+
+# Build the doctor directory once at startup (a no-op with an ingested directory store)
+open_directory()
+
+
+@app.before_serving
+async def warm_up_clients():
+    if LLM_WARMUP:
+        await warm_up_async()
+
+
+@app.route('/')
+async def index():
+    return "Hello, World!"
+
+
+@app.route('/metrics')
+async def metrics():
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
+def error_response(e):
+    return jsonify(error_body(e)), e.status, e.headers
+
+
+@app.route('/plan_diet', methods=['POST'])
+async def plan_diet():
+    try:
+        result = await generate_diet_async(diet_profile(await request.get_json()))
+        return jsonify(result), 200
+
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        log.exception("plan_diet.failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/scan_img', methods=['POST'])
+async def scan_img():
+    try:
+        form = await request.form
+        image, description, user_details = scan_img_input(await request.files, form)
+
+        if wants_async(request.args, request.headers):
+            return accept_job("scan_img", form, scan_img_result, image, description, user_details)
+
+        with image:
+            result = await scan_async(image, description, user_details)
+
+        return jsonify(scan_img_body(result)), 200
+
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        log.exception("scan_img.failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/scan_batch', methods=['POST'])
+async def scan_batch_route():
+    try:
+        form = await request.form
+        images, descriptions, user_details = scan_batch_input(await request.files, form)
+
+        if wants_async(request.args, request.headers):
+            return accept_job("scan_batch", form, scan_batch_result, images, descriptions, user_details)
+
+        try:
+            results = await scan_batch_async(images, descriptions, user_details)
+        finally:
+            close_uploads([images])
+        return jsonify(scan_batch_body(images, results)), 200
+
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        log.exception("scan_batch.failed")
+        return jsonify({"error": str(e)}), 500
+
+
+def accept_job(kind, form, fn, *args):
+    # Answer 202 straight away; the result is polled from /jobs/<id> or POSTed to the callback URL
+    try:
+        job = start_job(kind, fn, args, form, request.headers)
+    except RequestError as e:
+        return error_response(e)
+    status_url = url_for("job_status", job_id=job.id)
+    return jsonify(job_accepted(job, status_url)), 202, {"Location": status_url}
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+async def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.to_dict()), 200
+
+
+def stream_events(events, fmt):
+    async def body():
+        async for event in events:
+            yield encode_event(event, fmt)
+    return Response(body(), mimetype=mimetype(fmt))
+
+
+@app.route('/chatbot', methods=['POST'])
+async def chatbot():
+    try:
+        context = chat_context(await request.get_json())
+        user_prompt = context
+
+        # chat() has no async variant, keep it off the event loop
+        result = await asyncio.to_thread(chat, context, user_prompt)
+
+        return jsonify(result), 200
+
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        log.exception("chatbot.failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/upload_audio', methods=['POST'])
+async def upload_audio():
+    try:
+        fmt = stream_format(request.args, request.headers)
+
+        with audio_input("upload_audio", await request.files, stream=fmt) as audio:
+            if fmt:
+                text = await get_text_async(audio)
+            else:
+                result = await VoiceChat_async(audio)
+
+        if fmt:
+            # Transcript first, then the answer token by token
+            events = message_events_async(stream_response_async(text), [{"text": text}])
+            return stream_events(events, fmt)
+
+        return jsonify({"message": f"{result}"})
+
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        log.exception("upload_audio.failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/analyze_symptoms', methods=['POST'])
+async def analyze_symptoms_route():
+    try:
+        form = await request.form
+        user_profile, ingredients, audio, location = analyze_symptoms_input(await request.files, form)
+
+        if wants_async(request.args, request.headers):
+            return accept_job("analyze_symptoms", form, analyze_symptoms_result,
+                              user_profile, ingredients, audio, location)
+
+        # The stage graph runs on its own threads, keep it off the event loop
+        result = await asyncio.to_thread(analyze_symptoms_result, user_profile, ingredients, audio, location)
+        return jsonify(result), 200
+
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        log.exception("analyze_symptoms.failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/update_beds', methods=['POST'])
+async def update_beds_route():
+    try:
+        # Appends to the change log and writes through to SQLite, keep that off the event loop
+        result = await asyncio.to_thread(apply_bed_changes, await request.get_json())
+        return jsonify(result), 200
+
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        log.exception("update_beds.failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/doctors', methods=['GET'])
+async def doctors_route():
+    try:
+        # A cold lookup can load the CSV or query SQLite, also off the event loop
+        return jsonify(await asyncio.to_thread(doctors_page, request.args)), 200
+
+    except RequestError as e:
+        return error_response(e)
+    except Exception as e:
+        log.exception("doctors.failed")
+        return jsonify({"error": str(e)}), 500
+
+
+if __name__ == '__main__':
+    app.run(host="0.0.0.0", port=5000)
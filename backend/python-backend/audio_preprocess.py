@@ -0,0 +1,119 @@
+import hashlib
+import io
+import os
+from observability import get_logger, span
+
+try:
+    from pydub import AudioSegment
+    from pydub.silence import detect_leading_silence
+except ImportError:  # pydub (and ffmpeg) are optional, without them audio is sent as uploaded
+    AudioSegment = None
+
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "16000"))  # what Whisper resamples to anyway
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "ogg")
+AUDIO_CODEC = os.getenv("AUDIO_CODEC", "libopus")
+AUDIO_BITRATE = os.getenv("AUDIO_BITRATE", "24k")
+AUDIO_SILENCE_DB = float(os.getenv("AUDIO_SILENCE_DB", "-40"))  # dBFS below which audio counts as silence
+AUDIO_TRIM_PADDING_MS = int(os.getenv("AUDIO_TRIM_PADDING_MS", "200"))  # kept around speech when trimming
+
+log = get_logger("audio_preprocess")
+
+
+class PreparedAudio:
+    # A decoded, normalised recording. The compressed upload body is only
+    # produced when first asked for, so a transcript cache hit never pays for it.
+    def __init__(self, upload, segment=None):
+        self.upload = upload
+        self.segment = segment  # None when the audio couldn't be decoded and is passed through
+        self.bytes_before = upload.size
+        self._data = None
+
+    @property
+    def duration(self):
+        return len(self.segment) / 1000 if self.segment is not None else None
+
+    @property
+    def filename(self):
+        if self.segment is None or self._data is self.upload:
+            return self.upload.filename
+        base = os.path.splitext(self.upload.filename or "audio")[0]
+        return f"{base}.{AUDIO_FORMAT}"
+
+    @property
+    def data(self):
+        if self.segment is None:
+            return self.upload.payload()
+        if self._data is None:
+            try:
+                with span("audio_encode"):
+                    self._data = encode(self.segment)
+            except Exception as e:
+                log.warning("audio.encode_failed", error=str(e))
+                self._data = self.upload
+                return self.upload.payload()
+            log.debug("audio.preprocessed", bytes_before=self.bytes_before, bytes_after=len(self._data),
+                      audio_seconds=round(self.duration, 1))
+        if self._data is self.upload:
+            return self.upload.payload()
+        return self._data
+
+    def fingerprint(self):
+        # Hash of the normalised samples, so the same speech re-muxed into another
+        # container (or re-sent with different metadata) maps to the same key
+        digest = hashlib.sha256()
+        if self.segment is None:
+            digest.update(self.upload.getbuffer())
+        else:
+            digest.update(f"{self.segment.frame_rate}:{self.segment.sample_width}:{self.segment.channels}:".encode())
+            digest.update(self.segment.raw_data)
+        return digest.hexdigest()
+
+
+def decode(upload):
+    extension = os.path.splitext(upload.filename or "")[1].lstrip(".").lower() or None
+    return AudioSegment.from_file(io.BytesIO(upload.getbuffer()), format=extension)
+
+
+def normalize(segment):
+    # Mono, 16 kHz, 16-bit, without the silence before and after the speech
+    segment = segment.set_channels(1).set_frame_rate(AUDIO_SAMPLE_RATE).set_sample_width(2)
+    start = detect_leading_silence(segment, silence_threshold=AUDIO_SILENCE_DB)
+    end = len(segment) - detect_leading_silence(segment.reverse(), silence_threshold=AUDIO_SILENCE_DB)
+    if end <= start:
+        return segment  # nothing above the threshold, leave it for Whisper to judge
+    return segment[max(0, start - AUDIO_TRIM_PADDING_MS):min(len(segment), end + AUDIO_TRIM_PADDING_MS)]
+
+
+def encode(segment):
+    out = io.BytesIO()
+    segment.export(out, format=AUDIO_FORMAT, codec=AUDIO_CODEC, bitrate=AUDIO_BITRATE)
+    return out.getvalue()
+
+
+def prepare_audio(upload):
+    if AudioSegment is None:
+        return PreparedAudio(upload)
+
+    try:
+        segment = normalize(decode(upload))
+    except Exception as e:
+        log.warning("audio.preprocess_failed", error=str(e))
+        return PreparedAudio(upload)
+    return PreparedAudio(upload, segment)
+
+
+def split_on_silence(segment, target_ms, search_ms, frame_ms=30):
+    # Energy-based VAD: around every target_ms boundary, cut at the quietest
+    # frame within +/- search_ms so words aren't split across segments
+    pieces = []
+    start = 0
+    total = len(segment)
+    while total - start > target_ms + search_ms:
+        target = start + target_ms
+        lo = max(target - search_ms, start + frame_ms)
+        hi = min(target + search_ms, total - frame_ms)
+        cut = min(range(lo, hi, frame_ms), key=lambda t: segment[t:t + frame_ms].rms) + frame_ms // 2
+        pieces.append(segment[start:cut])
+        start = cut
+    pieces.append(segment[start:])
+    return pieces
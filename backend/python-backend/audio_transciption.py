@@ -1,15 +1,23 @@
-from groq import Groq
+from transcription import transcribe, transcribe_async
 
+class TranscribedAudio:
+    # An upload whose transcript is already known: audio_transcriber hands the
+    # text back without transcribing again, everything else sees the upload
+    def __init__(self, audio, text):
+        self.audio = audio
+        self.text = text
 
-client = Groq()
+    def __getattr__(self, name):
+        return getattr(self.audio, name)
 
-def audio_transcriber(filename):
-    with open(filename, "rb") as file:
-        transcription = client.audio.transcriptions.create(
-          file=(filename, file.read()),
-          model="whisper-large-v3-turbo",
-          response_format="verbose_json",
-        )
-        return transcription.text
-        
 
+def audio_transcriber(source):
+    if isinstance(source, TranscribedAudio):
+        return source.text
+    return transcribe(source)
+
+
+async def audio_transcriber_async(source):
+    if isinstance(source, TranscribedAudio):
+        return source.text
+    return await transcribe_async(source)
@@ -0,0 +1,312 @@
+# Microbenchmarks for the hot paths we own (no network calls).
+#
+#   python benchmarks/run_benchmarks.py                 # run and print
+#   python benchmarks/run_benchmarks.py --save          # record benchmarks/baselines.json
+#   python benchmarks/run_benchmarks.py --check         # fail if slower than the baseline
+#   python benchmarks/run_benchmarks.py --sizes 1000,10000 --only doctors
+#   python benchmarks/run_benchmarks.py --only cards --pages-dir saved_listing_pages/
+#
+# Baselines are machine-specific: record them on the machine that runs --check.
+# The committed baselines.json was recorded with --sizes 1000,10000,100000.
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "loadtest"))
+
+import pandas as pd
+from bs4 import BeautifulSoup
+import retreive_doctor_data
+import directory_store
+import doctor_results
+import retreive_beds
+import scan_food
+import diet
+import doctor_cards
+import listing_fixture
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+FIXTURE_PAGES = 20
+IMAGE_SIZES = [100 * 1024, 1024 * 1024, 4 * 1024 * 1024, 12 * 1024 * 1024]
+
+LOCALITIES = ["Andheri West", "Andheri East", "Bandra West", "Kurla West", "Kurla East", "Chembur", "Ghatkopar",
+              "Dadar", "Worli", "Powai", "Mulund West", "Borivali West", "Kandivali East", "Malad West",
+              "Goregaon East", "Colaba", "Sion", "Matunga", "Mahim", "Santacruz East"]
+SPECIALIZATIONS = ["Dentist", "Dermatologist", "General Physician", "Gynecologist", "Pediatrician",
+                   "Orthopedist", "Cardiologist", "Ear-Nose-Throat (ENT) Specialist", "Homoeopath", "Ayurveda"]
+# Queries cycled through by the cold filter benchmark, so no call repeats the previous one
+COLD_QUERIES = [([LOCALITIES[i].split()[0], LOCALITIES[(i + 7) % len(LOCALITIES)]],
+                 [SPECIALIZATIONS[i % len(SPECIALIZATIONS)], SPECIALIZATIONS[(i + 3) % len(SPECIALIZATIONS)]])
+                for i in range(len(LOCALITIES))]
+
+
+def synthetic_doctors(rows, seed=0):
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        "Doctor Name": [f"Dr. Synthetic {i}" for i in range(rows)],
+        "Specialization": [rng.choice(SPECIALIZATIONS) for _ in range(rows)],
+        "Experience": [f"{rng.randint(1, 40)} years experience overall" for _ in range(rows)],
+        "Location": [f"{rng.choice(LOCALITIES)}," for _ in range(rows)],
+        "City": ["Mumbai"] * rows,
+        "Hospital": [f"Clinic {rng.randint(1, rows // 3 + 1)}" for _ in range(rows)],
+        "Consultation Fee": [f"₹{rng.choice([300, 500, 800, 1000, 1500])}" for _ in range(rows)],
+        "Profile Link": [f"https://www.practo.com/mumbai/doctor/synthetic-{i}" for i in range(rows)],
+    })
+
+
+def synthetic_hospitals(rows, seed=0):
+    rng = random.Random(seed)
+    total = [rng.randint(20, 800) for _ in range(rows)]
+    return pd.DataFrame({
+        "_id": range(rows),
+        "Ward Name": [rng.choice("ABCDEFGHKLMNPRST") for _ in range(rows)],
+        "Type of Hospital/Health facility": [rng.choice(["Government", "Private", "Municipal"]) for _ in range(rows)],
+        "Hospital Name": [f"Hospital {i}" for i in range(rows)],
+        "Location": [rng.choice(LOCALITIES) for _ in range(rows)],
+        "Total Bed count": total,
+        "Available Bed Count": [rng.randint(0, t) for t in total],
+    })
+
+
+def synthetic_scan_response(facts=9, ingredients=25):
+    return json.dumps({
+        "nutritional_facts": [f"- Total nutrient{i}: {i * 1.5}g" for i in range(facts)],
+        "ingredients": [f"ingredient {i}" for i in range(ingredients)],
+        "feedback": "Moderate sodium, fine for the user's profile. " * 5,
+        "final_thoughts": "OK in moderation.",
+    })
+
+
+def synthetic_diet_response():
+    return json.dumps({
+        "diet_nutritions": [f"nutrient{i}: {i * 10}" for i in range(11)] + ["malformed fact"],
+        "suggestions": [f"Dish {i}" for i in range(8)],
+    })
+
+
+def measure(fn, repeat=5, min_time=0.2):
+    # Calls per sample are scaled so each sample runs for at least min_time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "calls_per_sample": number}
+
+
+def cold_filter(directory):
+    # filter() with the directory's per-term match memos emptied first, so
+    # every call pays for the substring and locality matching again
+    queries = itertools.cycle(COLD_QUERIES)
+
+    def run():
+        directory._specialization_matches.clear()
+        directory.location_matcher._matches.clear()
+        directory._candidates.clear()
+        directory.filter(*next(queries))
+    return run
+
+
+def bench_doctors(sizes, workdir):
+    results = {}
+    for rows in sizes:
+        csv_file = os.path.join(workdir, f"doctors_{rows}.csv")
+        synthetic_doctors(rows).to_csv(csv_file, index=False)
+        results[f"doctors.load[{rows}]"] = measure(lambda: retreive_doctor_data.DoctorDirectory.from_csv(csv_file), repeat=3, min_time=0)
+        retreive_doctor_data.load_directory(csv_file)
+        results[f"doctors.filter_doctors[{rows}]"] = measure(
+            lambda: retreive_doctor_data.filter_doctors(csv_file, ["Kurla", "Chembur"], ["Dentist", "Physician"]))
+        directory = retreive_doctor_data.load_directory(csv_file)
+        results[f"doctors.filter_doctors_cold[{rows}]"] = measure(cold_filter(directory), repeat=3)
+        results[f"doctors.top20_by_fee[{rows}]"] = measure(lambda: json.dumps(doctor_results.doctor_page(
+            directory.candidates(["Kurla", "Chembur"], ["Dentist", "Physician"]), directory.load,
+            list(directory.df.columns), sort="fee")))
+        retreive_doctor_data._directories.pop(csv_file, None)
+
+        db_file = os.path.join(workdir, f"doctors_{rows}.db")
+        directory_store.build(db_file, retreive_doctor_data.DoctorDirectory.from_csv(csv_file).records(),
+                              sources={"doctors": csv_file})
+        store = directory_store.DirectoryStore(db_file)
+        results[f"doctors.store_open[{rows}]"] = measure(
+            lambda: directory_store.DirectoryStore(db_file).source("doctors"), repeat=3, min_time=0)
+        results[f"doctors.store_query[{rows}]"] = measure(
+            lambda: store.doctors_json(["Kurla", "Chembur"], ["Dentist", "Physician"]))
+        results[f"doctors.store_top20_by_fee[{rows}]"] = measure(lambda: json.dumps(doctor_results.doctor_page(
+            store.doctor_candidates(["Kurla", "Chembur"], ["Dentist", "Physician"]), store.load_doctors,
+            json.loads(store.meta("doctor_columns")), sort="fee")))
+    return results
+
+
+def bench_beds(sizes, workdir):
+    results = {}
+    for rows in sizes:
+        csv_file = os.path.join(workdir, f"hospitals_{rows}.csv")
+        synthetic_hospitals(rows).to_csv(csv_file, index=False)
+        updates_file = os.path.join(workdir, f"hospitals_{rows}.updates.jsonl")
+        results[f"beds.load[{rows}]"] = measure(lambda: retreive_beds.BedInventory(csv_file, updates_file), repeat=3, min_time=0)
+        retreive_beds._inventories[csv_file] = retreive_beds.BedInventory(csv_file, updates_file)
+        results[f"beds.filter_hopitals[{rows}]"] = measure(
+            lambda: retreive_beds.filter_hopitals(csv_file, ["kurla west", "kurla east"]))
+        retreive_beds._inventories.pop(csv_file, None)
+    return results
+
+
+def bench_images(workdir):
+    results = {}
+    rng = random.Random(0)
+    for size in IMAGE_SIZES:
+        path = os.path.join(workdir, f"image_{size}.jpg")
+        with open(path, "wb") as f:
+            f.write(rng.randbytes(size))
+        results[f"scan_food.encode_image[{size // 1024}KiB]"] = measure(lambda: scan_food.encode_image(path))
+    return results
+
+
+def bench_parsing():
+    scan_response = synthetic_scan_response()
+    diet_response = synthetic_diet_response()
+    return {
+        "scan_food.clean_data": measure(lambda: scan_food.clean_data(scan_response)),
+        "diet.clean": measure(lambda: diet.clean(diet_response)),
+    }
+
+
+def legacy_extract_cards(html):
+    # The scrapers' extraction before doctor_cards: an html.parser tree and a
+    # separate find() per field. Kept here as the reference point.
+    soup = BeautifulSoup(html, "html.parser")
+    data = []
+    for card in soup.find_all("div", class_="listing-doctor-card"):
+        row = {}
+        h2 = card.find("h2", {"data-qa-id": "doctor_name"})
+        row["Doctor Name"] = h2.text.strip() if h2 else None
+        grey = card.find("div", class_="u-grey_3-text")
+        row["Specialization"] = grey.find("span").text.strip() if grey and grey.find("span") else None
+        for column, tag, qa_id in [("Experience", "div", "doctor_experience"), ("Location", "span", "practice_locality"),
+                                   ("City", "span", "practice_city"), ("Hospital", "span", "doctor_clinic_name"),
+                                   ("Consultation Fee", "span", "consultation_fee"),
+                                   ("Recommendation", "span", "doctor_recommendation"),
+                                   ("Patient Stories", "span", "total_feedback"),
+                                   ("Availability", "span", "availability_text")]:
+            element = card.find(tag, {"data-qa-id": qa_id})
+            row[column] = element.text.strip() if element else None
+        photo = card.find("img", {"data-qa-id": "doctor_profile_photo"})
+        row["Profile Photo"] = photo["src"] if photo else None
+        link = card.find("a", href=True)
+        row["Profile Link"] = "https://www.practo.com" + link["href"] if link else None
+        data.append(row)
+    return data
+
+
+def bench_cards(pages_dir, workdir):
+    # Saved listing pages when given, otherwise generated fixture pages
+    if not pages_dir:
+        pages_dir = os.path.join(workdir, "listing_pages")
+        listing_fixture.generate(pages_dir, FIXTURE_PAGES)
+    pages = []
+    for name in sorted(os.listdir(pages_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(pages_dir, name), encoding="utf-8") as f:
+                pages.append(f.read())
+
+    expected = [legacy_extract_cards(page) for page in pages]
+    extractors = {"bs4_legacy": legacy_extract_cards}
+    for parser in doctor_cards.available_parsers():
+        extractors[parser] = lambda page, parser=parser: doctor_cards.extract_rows(page, parser)
+        rows = [[{k: row[k] for k in legacy_row} for row, legacy_row in zip(page_rows, legacy_rows)]
+                for page_rows, legacy_rows in zip(map(extractors[parser], pages), expected)]
+        if rows != expected:
+            print(f"  {parser} extracted different records than the legacy extractor")
+
+    results = {}
+    for name, extract in extractors.items():
+        result = measure(lambda: [extract(page) for page in pages], repeat=3, min_time=0)
+        results[f"cards.{name}[{len(pages)}pages]"] = result
+        print(f"  {name:12s} {len(pages) / result['median_s']:10.1f} pages/s")
+    return results
+
+
+SUITES = {
+    "doctors": lambda args, workdir: bench_doctors(args.sizes, workdir),
+    "beds": lambda args, workdir: bench_beds(args.sizes, workdir),
+    "images": lambda args, workdir: bench_images(workdir),
+    "parsing": lambda args, workdir: bench_parsing(),
+    "cards": lambda args, workdir: bench_cards(args.pages_dir, workdir),
+}
+
+
+def check(results, baselines, tolerance):
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"  {name}: no baseline")
+            continue
+        ratio = result["median_s"] / baseline["median_s"]
+        status = "REGRESSION" if ratio > tolerance else "ok"
+        print(f"  {name}: {ratio:.2f}x baseline {status}")
+        if ratio > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the local hot paths")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=DEFAULT_SIZES,
+                        help="comma-separated row counts for the synthetic directories")
+    parser.add_argument("--only", choices=sorted(SUITES), action="append", help="run only these suites")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baselines")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if any benchmark regressed")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor for --check")
+    parser.add_argument("--baselines", default=BASELINE_FILE)
+    parser.add_argument("--pages-dir", help="directory of saved listing pages for the cards suite")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for suite in args.only or SUITES:
+            print(f"Running {suite} benchmarks...")
+            results.update(SUITES[suite](args, workdir))
+
+    for name, result in results.items():
+        print(f"{name:45s} median {result['median_s'] * 1e6:12.1f} us   min {result['min_s'] * 1e6:12.1f} us")
+
+    if args.check:
+        with open(args.baselines, encoding="utf-8") as f:
+            baselines = json.load(f)
+        regressions = check(results, baselines, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed beyond {args.tolerance}x: {regressions}")
+            sys.exit(1)
+
+    if args.save:
+        baselines = {}
+        if os.path.exists(args.baselines):
+            with open(args.baselines, encoding="utf-8") as f:
+                baselines = json.load(f)
+        baselines.update(results)
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} baselines to {args.baselines}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
-from openai import OpenAI
 import datetime
 import os
 from pydantic import BaseModel
 import json
+from llm_clients import openai_client, async_openai_client
+from response_cache import ResponseCache, canonical_hash, MISSING
+from observability import get_logger, span, llm_call, record_usage
 
+log = get_logger("diet")
+
+# Same profile -> same plan; the Node backend resends the profile whenever the app reopens
+diet_cache = ResponseCache(
+    "diet",
+    max_entries=int(os.getenv("DIET_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.getenv("DIET_CACHE_TTL", str(24 * 3600))),
+    disk_dir=os.getenv("DIET_CACHE_DIR") or None,  # unset = memory only
+)
 
 
 
@@ -53,10 +64,9 @@ def clean(data):
             try:
                 nutritional_facts_dict[key] = str(value)  # Convert to float
             except ValueError:
-                print(fact)
-                print(f"Skipping invalid nutritional fact: {fact}")
+                log.warning("diet.invalid_fact", fact=fact)
         else:
-            print(f"Skipping malformed fact: {fact}")
+            log.warning("diet.malformed_fact", fact=fact)
 
     # Convert to JSON (optional, for pretty printing)
     nutritional_facts_json = json.dumps(nutritional_facts_dict, indent=2)
@@ -73,18 +83,15 @@ the format for diet_nutritions - eg. calories : 400, carbohydrates : 500
 suggestions: Based on the generated nutrition plan, suggest some dishes for the user that will benefit them, suggest indian dishes
 """
 
-def generate_diet(user_profile):
+MODEL = "gpt-4o"
+
+
+def diet_request(user_profile):
 #   system = "You are a nutritionist, based on the users profile, medical history, goals, and food preferences, generate a personalized nutrition plan for the user. The nutrition plan should include meal suggestions, amount of calories, proteins, carbohydrates, fats, sugar, various vitamins, etc. (Inlcude more nutritions), all the nutritions needed to be consumed in a day only. do not send plans for breakfast, lunch, etc. the values of the nutrition should be in grams only and not in mg, no values should be more than 500 and other non significant values should be less than 100"
 #   system = "You are a nutritionist, based on the users profile, medical history, goals, and food preferences, generate a personalized nutrition plan for the user. The nutrition plan should include meal suggestions, amount of calories, proteins, carbohydrates, fats, sugar, various vitamins, etc. (Inlcude more nutritions), all the nutritions needed to be consumed in a day only. do not send plans for breakfast, lunch, etc. the values of the nutrition should be in grams only and not in mg, and suggest indian dishes only"
   system = system_message
 
-  key = os.getenv("OPENAI_API_KEY")
-
-  MODEL="gpt-4o"
-  client = OpenAI(api_key=key)
-
-
-  completion = client.beta.chat.completions.parse(
+  return dict(
     model=MODEL,
     messages=[
       {"role": "system", "content": system},
@@ -93,14 +100,57 @@ def generate_diet(user_profile):
     response_format=diet_format,
   )
 
+
+def parse_diet(completion):
   data = completion.choices[0].message.content
-  print("DATA")
-  print(data)
-  diet_nutritions, suggestions = clean(data)
+  log.debug("diet.response", data=data)
+  with span("parse"):
+    diet_nutritions, suggestions = clean(data)
+  log.info("diet.parsed", suggestions=len(suggestions), response_bytes=len(data))
 
   return [diet_nutritions, suggestions]
 
 
+def request_diet(user_profile):
+  with llm_call(MODEL):
+    completion = openai_client().beta.chat.completions.parse(**diet_request(user_profile))
+  record_usage(MODEL, completion)
+  return parse_diet(completion)
+
+
+async def request_diet_async(user_profile):
+  with llm_call(MODEL):
+    completion = await async_openai_client().beta.chat.completions.parse(**diet_request(user_profile))
+  record_usage(MODEL, completion)
+  return parse_diet(completion)
+
+
+def generate_diet(user_profile):
+  with span("cache_lookup"):
+    key = canonical_hash(user_profile)
+    result = diet_cache.get(key)
+  if result is not MISSING:
+    log.info("diet.cache_hit", **diet_cache.stats())
+    return result
+
+  result = request_diet(user_profile)
+  diet_cache.set(key, result)
+  return result
+
+
+async def generate_diet_async(user_profile):
+  with span("cache_lookup"):
+    key = canonical_hash(user_profile)
+    result = diet_cache.get(key)
+  if result is not MISSING:
+    log.info("diet.cache_hit", **diet_cache.stats())
+    return result
+
+  result = await request_diet_async(user_profile)
+  diet_cache.set(key, result)
+  return result
+
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,356 @@
+import json
+import os
+import sqlite3
+import textwrap
+import threading
+import time
+from doctor_cards import profile_key, EXPERIENCE_YEARS, FEE_AMOUNT
+from doctor_results import Candidate
+from locality_matcher import LocalityMatcher, MAX_CACHED_QUERIES
+
+# Compiled doctor + hospital directory written by ingest_directory.py. Every
+# worker process opens the same file and shares its pages through the OS page
+# cache (mmap), so nothing is parsed or built at startup.
+DIRECTORY_DB = os.getenv("DIRECTORY_DB", "data/directory.db")
+STORE_MMAP_BYTES = int(os.getenv("STORE_MMAP_BYTES", str(256 * 1024 * 1024)))
+STORE_BUSY_TIMEOUT = float(os.getenv("STORE_BUSY_TIMEOUT", "10"))
+STORE_POLL_SECONDS = 2.0  # how often a reader checks whether the file was re-ingested
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+
+CREATE TABLE doctors (
+    id INTEGER PRIMARY KEY,
+    profile_key TEXT UNIQUE,
+    name TEXT,
+    specialization TEXT,
+    location TEXT,
+    hospital TEXT,
+    experience_years INTEGER,
+    fee INTEGER,
+    record TEXT NOT NULL
+);
+CREATE INDEX doctors_location ON doctors (location);
+CREATE INDEX doctors_specialization ON doctors (specialization);
+CREATE INDEX doctors_experience ON doctors (experience_years);
+CREATE INDEX doctors_fee ON doctors (fee);
+
+CREATE TABLE hospitals (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    name TEXT,
+    location TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX hospitals_location ON hospitals (location);
+
+CREATE VIRTUAL TABLE doctors_fts USING fts5(
+    name, hospital, specialization, location,
+    content='doctors', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE hospitals_fts USING fts5(
+    name, location,
+    content='hospitals', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Keep the full-text indexes in step with later upserts; created after the bulk load
+TRIGGERS = """
+CREATE TRIGGER doctors_ai AFTER INSERT ON doctors BEGIN
+    INSERT INTO doctors_fts (rowid, name, hospital, specialization, location)
+    VALUES (new.id, new.name, new.hospital, new.specialization, new.location);
+END;
+CREATE TRIGGER doctors_ad AFTER DELETE ON doctors BEGIN
+    INSERT INTO doctors_fts (doctors_fts, rowid, name, hospital, specialization, location)
+    VALUES ('delete', old.id, old.name, old.hospital, old.specialization, old.location);
+END;
+CREATE TRIGGER doctors_au AFTER UPDATE ON doctors BEGIN
+    INSERT INTO doctors_fts (doctors_fts, rowid, name, hospital, specialization, location)
+    VALUES ('delete', old.id, old.name, old.hospital, old.specialization, old.location);
+    INSERT INTO doctors_fts (rowid, name, hospital, specialization, location)
+    VALUES (new.id, new.name, new.hospital, new.specialization, new.location);
+END;
+CREATE TRIGGER hospitals_ai AFTER INSERT ON hospitals BEGIN
+    INSERT INTO hospitals_fts (rowid, name, location) VALUES (new.id, new.name, new.location);
+END;
+CREATE TRIGGER hospitals_ad AFTER DELETE ON hospitals BEGIN
+    INSERT INTO hospitals_fts (hospitals_fts, rowid, name, location)
+    VALUES ('delete', old.id, old.name, old.location);
+END;
+CREATE TRIGGER hospitals_au AFTER UPDATE ON hospitals BEGIN
+    INSERT INTO hospitals_fts (hospitals_fts, rowid, name, location)
+    VALUES ('delete', old.id, old.name, old.location);
+    INSERT INTO hospitals_fts (rowid, name, location) VALUES (new.id, new.name, new.location);
+END;
+"""
+
+DOCTOR_UPSERT = """
+INSERT INTO doctors (profile_key, name, specialization, location, hospital, experience_years, fee, record)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (profile_key) DO UPDATE SET
+    name = excluded.name, specialization = excluded.specialization, location = excluded.location,
+    hospital = excluded.hospital, experience_years = excluded.experience_years, fee = excluded.fee,
+    record = excluded.record
+"""
+HOSPITAL_UPSERT = """
+INSERT INTO hospitals (key, name, location, record) VALUES (?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET name = excluded.name, location = excluded.location, record = excluded.record
+"""
+
+
+def clean_text(value):
+    # "Chembur," -> "chembur"; missing values index as empty text
+    if value is None:
+        return ""
+    return str(value).strip().strip(",").strip().lower()
+
+
+def fts_phrase(text, prefix=True):
+    # A quoted phrase; with prefix its last word matches as a prefix, so "kurl" finds "kurla west"
+    return '"' + text.replace('"', '""') + ('"*' if prefix else '"')
+
+
+def fts_any(column, terms, prefix=True):
+    terms = [fts_phrase(clean_text(t), prefix) for t in terms if any(c.isalnum() for c in str(t))]
+    if not terms:
+        return None
+    return f"{column} : ({' OR '.join(terms)})"
+
+
+def record_text(record):
+    # Stored as one element of a json.dumps(records, indent=4) list, so query
+    # results are spliced together without decoding and re-encoding each record
+    return textwrap.indent(json.dumps(record, indent=4), "    ")
+
+
+def records_json(texts):
+    return "[\n" + ",\n".join(texts) + "\n]" if texts else "[]"
+
+
+def doctor_row(record):
+    return (profile_key(record.get("Profile Link")), record.get("Doctor Name"), clean_text(record.get("Specialization")),
+            clean_text(record.get("Location")), record.get("Hospital"), record.get(EXPERIENCE_YEARS),
+            record.get(FEE_AMOUNT), record_text(record))
+
+
+def hospital_row(key, record, name_column):
+    return (str(key), record.get(name_column), clean_text(record.get("Location")), record_text(record))
+
+
+def build(path, doctors=None, hospitals=None, sources=None):
+    # doctors: list of records; hospitals: (key column, {key: record}).
+    # Written to a temporary file and swapped in, so readers never see a half-built store.
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        meta = {"built": str(time.time()), "beds_version": "0"}
+        if doctors is not None:
+            conn.executemany(DOCTOR_UPSERT, (doctor_row(record) for record in doctors))
+            meta["doctor_columns"] = json.dumps(list(doctors[0]) if doctors else [])
+        if hospitals is not None:
+            key_column, records = hospitals
+            name_column = "Hospital Name"
+            conn.executemany(HOSPITAL_UPSERT, (hospital_row(k, r, name_column) for k, r in records.items()))
+            meta["hospital_key"] = key_column
+        for section, source in (sources or {}).items():
+            meta[f"{section}_source"] = os.path.abspath(source)
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta.items())
+        conn.execute("INSERT INTO doctors_fts (doctors_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO hospitals_fts (hospitals_fts) VALUES ('rebuild')")
+        conn.executescript(TRIGGERS)
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+
+
+class DirectoryStore:
+    def __init__(self, path=DIRECTORY_DB):
+        self.path = path
+        self._local = threading.local()  # sqlite connections are per thread
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=STORE_BUSY_TIMEOUT)
+        conn.execute(f"PRAGMA mmap_size = {STORE_MMAP_BYTES}")
+        conn.execute("PRAGMA query_only = 1")
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        return conn, meta
+
+    def _reader(self):
+        # (connection, meta) for this thread, or None when nothing was ingested.
+        # Reopened when ingest swaps in a new file.
+        local = self._local
+        now = time.monotonic()
+        if getattr(local, "next_check", 0) > now:
+            return local.state
+        local.next_check = now + STORE_POLL_SECONDS
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if getattr(local, "inode", None) != inode or not hasattr(local, "state"):
+            if getattr(local, "state", None) is not None:
+                local.state[0].close()
+            local.state = self._open() if inode is not None else None
+            local.inode = inode
+            local.data_version = None
+        if local.state is not None:
+            # Changes when another connection commits, e.g. an upsert adding a new locality
+            data_version = local.state[0].execute("PRAGMA data_version").fetchone()[0]
+            if data_version != local.data_version:
+                local.data_version = data_version
+                local.matchers = {}
+                local.candidates = {}
+        return local.state
+
+    def _matcher(self, table):
+        # Locality matcher over the distinct (cleaned) locations of a table
+        self._reader()
+        matcher = self._local.matchers.get(table)
+        if matcher is None:
+            conn = self._local.state[0]
+            matcher = LocalityMatcher([value for (value,) in conn.execute(f"SELECT DISTINCT location FROM {table}")])
+            self._local.matchers[table] = matcher
+        return matcher
+
+    def _ranked_texts(self, sql, scores, match):
+        # sql selects (location, record) rows whose FTS location phrase matches;
+        # phrases also hit longer names ("chembur" in "chembur east"), so rows
+        # are kept only for the matched values, best locality first
+        conn = self._reader()[0]
+        rows = [row for row in conn.execute(sql, (match,)) if row[0] in scores]
+        rows.sort(key=lambda row: -scores[row[0]])
+        return [record for _, record in rows]
+
+    def source(self, section):
+        # Absolute path of the CSV the section was ingested from, None when absent
+        state = self._reader()
+        return state[1].get(f"{section}_source") if state else None
+
+    def meta(self, key):
+        state = self._reader()
+        return state[1].get(key) if state else None
+
+    def _texts(self, sql, params):
+        conn = self._reader()[0]
+        return [record for (record,) in conn.execute(sql, params)]
+
+    def _doctor_match(self, locations, specializations):
+        # (locality scores, FTS query) or None when nothing can match
+        scores = self._matcher("doctors").match_all(locations)
+        location_match = fts_any("location", scores, prefix=False)
+        specialization_match = fts_any("specialization", specializations)
+        if location_match is None or specialization_match is None:
+            return None
+        return scores, f"({location_match}) AND ({specialization_match})"
+
+    def doctors_json(self, locations, specializations):
+        # Same contract and output as DoctorDirectory.filter: any location and
+        # any specialization, best locality match first
+        match = self._doctor_match(locations, specializations)
+        if match is None:
+            return records_json([])
+        return records_json(self._ranked_texts(
+            "SELECT d.location, d.record FROM doctors_fts JOIN doctors d ON d.id = doctors_fts.rowid "
+            "WHERE doctors_fts MATCH ? ORDER BY d.id",
+            *match))
+
+    def doctor_candidates(self, locations, specializations):
+        # Sort columns only; records are loaded for the chosen page alone.
+        # Memoised per thread until the data changes.
+        key = (tuple(locations), tuple(specializations))
+        conn = self._reader()[0]
+        candidates = self._local.candidates.get(key)
+        if candidates is None:
+            match = self._doctor_match(locations, specializations)
+            candidates = []
+            if match is not None:
+                scores, query = match
+                rows = conn.execute(
+                    "SELECT d.id, d.location, d.experience_years, d.fee FROM doctors_fts "
+                    "JOIN doctors d ON d.id = doctors_fts.rowid WHERE doctors_fts MATCH ?", (query,))
+                candidates = [Candidate(doctor_id, doctor_id, scores[location], experience, fee, location)
+                              for doctor_id, location, experience, fee in rows if location in scores]
+            if len(self._local.candidates) >= MAX_CACHED_QUERIES:
+                self._local.candidates.clear()
+            self._local.candidates[key] = candidates
+        return candidates
+
+    def load_doctors(self, ids):
+        if not ids:
+            return []
+        conn = self._reader()[0]
+        records = dict(conn.execute(f"SELECT id, record FROM doctors WHERE id IN ({','.join('?' * len(ids))})", ids))
+        return [json.loads(records[doctor_id]) for doctor_id in ids]
+
+    def search_doctors(self, text, limit=20):
+        # Free text over name, hospital, specialization and locality, best match first
+        words = [w for w in text.split() if any(c.isalnum() for c in w)]
+        if not words:
+            return []
+        query = " ".join(fts_phrase(clean_text(w)) for w in words)
+        return [json.loads(record) for record in self._texts(
+            "SELECT d.record FROM doctors_fts JOIN doctors d ON d.id = doctors_fts.rowid "
+            "WHERE doctors_fts MATCH ? ORDER BY rank LIMIT ?",
+            (query, limit))]
+
+    def hospitals_named(self, name):
+        return [json.loads(record) for record in self._texts(
+            "SELECT record FROM hospitals WHERE name = ? COLLATE NOCASE ORDER BY id", (str(name).strip(),))]
+
+    def has_hospital(self, key):
+        return bool(self._texts("SELECT record FROM hospitals WHERE key = ?", (str(key),)))
+
+    def hospitals_json(self, locations):
+        scores = self._matcher("hospitals").match_all(locations)
+        location_match = fts_any("location", scores, prefix=False)
+        if location_match is None:
+            return records_json([])
+        return records_json(self._ranked_texts(
+            "SELECT h.location, h.record FROM hospitals_fts JOIN hospitals h ON h.id = hospitals_fts.rowid "
+            "WHERE hospitals_fts MATCH ? ORDER BY h.id",
+            scores, location_match))
+
+    def _writer(self):
+        return sqlite3.connect(self.path, timeout=STORE_BUSY_TIMEOUT)
+
+    def upsert_doctors(self, records):
+        conn = self._writer()
+        try:
+            with conn:
+                conn.executemany(DOCTOR_UPSERT, (doctor_row(record) for record in records))
+        finally:
+            conn.close()
+        return len(records)
+
+    def apply_hospital_changes(self, changes, merge):
+        # merge(hospitals, key column, changes) edits the {key: record} mapping in
+        # place and returns the changed keys; runs inside one write transaction so
+        # concurrent updaters can't interleave. Returns the new beds version.
+        conn = self._writer()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                meta = dict(conn.execute("SELECT key, value FROM meta"))
+                key_column = meta["hospital_key"]
+                keys = {str(change[key_column]) for change in changes if change.get(key_column) is not None}
+                hospitals = {}
+                if keys:
+                    for (record,) in conn.execute(
+                            f"SELECT record FROM hospitals WHERE key IN ({','.join('?' * len(keys))})", list(keys)):
+                        record = json.loads(record)
+                        hospitals[record[key_column]] = record
+                changed = merge(hospitals, key_column, changes)
+                conn.executemany(HOSPITAL_UPSERT, (hospital_row(k, hospitals[k], "Hospital Name") for k in changed))
+                version = int(meta["beds_version"]) + 1
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'beds_version'", (str(version),))
+        finally:
+            conn.close()
+        return version
+
+
+store = DirectoryStore()
@@ -0,0 +1,162 @@
+import os
+import re
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# selectolax (Lexbor) is the fastest; lxml is the fallback. Either is enough.
+CARD_PARSER = os.getenv("CARD_PARSER") or ("selectolax" if LexborHTMLParser else "lxml")
+
+PRACTO_URL = "https://www.practo.com"
+
+# data-qa-id on the card -> DoctorCard field holding its text
+QA_FIELDS = {
+    "doctor_name": "name",
+    "doctor_experience": "experience",
+    "practice_locality": "location",
+    "practice_city": "city",
+    "doctor_clinic_name": "hospital",
+    "consultation_fee": "consultation_fee",
+    "doctor_recommendation": "recommendation",
+    "total_feedback": "patient_stories",
+    "availability_text": "availability",
+}
+PHOTO_QA_ID = "doctor_profile_photo"
+
+# Query parameters that change on every crawl and don't identify the doctor
+VOLATILE_PARAMS = {"page_uid", "referrer"}
+
+
+class DoctorCard(NamedTuple):
+    name: Optional[str] = None
+    specialization: Optional[str] = None
+    experience: Optional[str] = None
+    location: Optional[str] = None
+    city: Optional[str] = None
+    hospital: Optional[str] = None
+    consultation_fee: Optional[str] = None
+    recommendation: Optional[str] = None
+    patient_stories: Optional[str] = None
+    availability: Optional[str] = None
+    profile_photo: Optional[str] = None
+    profile_link: Optional[str] = None
+
+    def to_row(self):
+        return dict(zip(COLUMNS, self))
+
+
+# CSV column for each DoctorCard field, in field order
+COLUMNS = ("Doctor Name", "Specialization", "Experience", "Location", "City", "Hospital", "Consultation Fee",
+           "Recommendation", "Patient Stories", "Availability", "Profile Photo", "Profile Link")
+
+
+def profile_key(link):
+    # Practo stamps a fresh page_uid on every listing, so the raw link differs per crawl
+    if not isinstance(link, str) or not link:
+        return None
+    parts = urlsplit(link)
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE_PARAMS))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+# Numeric columns derived from the scraped text at ingest
+EXPERIENCE_YEARS = "Experience Years"
+FEE_AMOUNT = "Fee Amount"
+
+_YEARS = re.compile(r"(\d+)\s*years?", re.IGNORECASE)
+_AMOUNT = re.compile(r"\d[\d,]*")
+
+
+def experience_years(text):
+    # "29 years experience overall" -> 29
+    match = _YEARS.search(text) if isinstance(text, str) else None
+    return int(match.group(1)) if match else None
+
+
+def fee_amount(text):
+    # "₹1,500" -> 1500, "Free Consultation" -> 0
+    if not isinstance(text, str):
+        return None
+    if "free" in text.lower():
+        return 0
+    match = _AMOUNT.search(text)
+    return int(match.group().replace(",", "")) if match else None
+
+
+def _absolute(href):
+    return PRACTO_URL + href if href and href.startswith("/") else href
+
+
+def _cards_selectolax(html):
+    tree = LexborHTMLParser(html)
+    for card in tree.css("div.listing-doctor-card"):
+        fields = {}
+        # Every tagged field of the card in one selector pass
+        for node in card.css("[data-qa-id]"):
+            qa_id = node.attributes.get("data-qa-id")
+            field = QA_FIELDS.get(qa_id)
+            if field is not None:
+                fields.setdefault(field, node.text().strip())
+            elif qa_id == PHOTO_QA_ID:
+                fields.setdefault("profile_photo", node.attributes.get("src"))
+        specialization = card.css_first("div.u-grey_3-text span")
+        if specialization is not None:
+            fields["specialization"] = specialization.text().strip() or None
+        link = card.css_first("a[href]")
+        if link is not None:
+            fields["profile_link"] = _absolute(link.attributes.get("href"))
+        yield DoctorCard(**fields)
+
+
+def _has_class(element, name):
+    return name in (element.get("class") or "").split()
+
+
+def _cards_lxml(html):
+    root = lxml.html.fromstring(html)
+    for card in root.xpath("//div[contains(concat(' ', normalize-space(@class), ' '), ' listing-doctor-card ')]"):
+        fields = {}
+        grey = None
+        # One walk over the card's elements picks up every field
+        for element in card.iter():
+            if not isinstance(element.tag, str):
+                continue  # comments and processing instructions
+            qa_id = element.get("data-qa-id")
+            if qa_id is not None:
+                field = QA_FIELDS.get(qa_id)
+                if field is not None:
+                    fields.setdefault(field, element.text_content().strip())
+                elif qa_id == PHOTO_QA_ID:
+                    fields.setdefault("profile_photo", element.get("src"))
+            if element.tag == "a" and "profile_link" not in fields and element.get("href") is not None:
+                fields["profile_link"] = _absolute(element.get("href"))
+            elif element.tag == "div" and grey is None and _has_class(element, "u-grey_3-text"):
+                grey = element
+            elif element.tag == "span" and grey is not None and "specialization" not in fields \
+                    and any(ancestor is grey for ancestor in element.iterancestors()):
+                fields["specialization"] = element.text_content().strip() or None
+        yield DoctorCard(**fields)
+
+
+PARSERS = {"selectolax": _cards_selectolax, "lxml": _cards_lxml}
+
+
+def available_parsers():
+    return [name for name, module in (("selectolax", LexborHTMLParser), ("lxml", lxml)) if module is not None]
+
+
+def parse_cards(html, parser=None):
+    # Parses a listing page once and returns a DoctorCard per listing-doctor-card
+    return list(PARSERS[parser or CARD_PARSER](html))
+
+
+def extract_rows(html, parser=None):
+    return [card.to_row() for card in parse_cards(html, parser)]
@@ -0,0 +1,169 @@
+import base64
+import hashlib
+import heapq
+import json
+import os
+from typing import NamedTuple, Optional
+from locality_matcher import LocalityMatcher, normalize_locality, MIN_PART_LENGTH
+from locality_resolver import LOCALITIES, haversine, parse_coordinates
+
+DOCTOR_PAGE_SIZE = int(os.getenv("DOCTOR_PAGE_SIZE", "20"))
+DOCTOR_MAX_PAGE_SIZE = int(os.getenv("DOCTOR_MAX_PAGE_SIZE", "100"))
+
+SORT_KEYS = ("relevance", "experience", "fee", "distance")
+DISTANCE_FIELD = "Distance Km"
+
+GAZETTEER_MIN_SCORE = 0.6  # weakest fuzzy match to a gazetteer locality whose centre is still used
+
+# Gazetteer centre for each normalised locality base ("andheri west," -> "andheri");
+# a locality missing there ("lbs marg, mulund") falls back to its best gazetteer match
+_COORDINATES = {normalize_locality(name)[0]: coordinates for name, coordinates in LOCALITIES.items()}
+_GAZETTEER = LocalityMatcher(LOCALITIES)
+
+
+class Candidate(NamedTuple):
+    row: object  # whatever the backend loads the record with
+    position: int  # directory order
+    score: float  # how well the locality matched
+    experience: Optional[int]
+    fee: Optional[int]
+    location: str
+
+
+def locality_coordinates(location):
+    base = normalize_locality(location)[0]
+    coordinates = _COORDINATES.get(base)
+    if coordinates is None:
+        matches = _GAZETTEER.match(str(location))
+        if matches and matches[0][1] >= GAZETTEER_MIN_SCORE:
+            coordinates = LOCALITIES[matches[0][0]]
+    if coordinates is None:
+        # A road or landmark named with its locality ("lbs marg, mulund")
+        parts = [name for name in _COORDINATES if len(name) >= MIN_PART_LENGTH and name in base]
+        if parts:
+            coordinates = _COORDINATES[max(parts, key=len)]
+    return coordinates
+
+
+def locality_distance(location, origin, cache):
+    distance = cache.get(location, False)
+    if distance is False:
+        coordinates = locality_coordinates(location)
+        distance = None if coordinates is None else round(haversine(*origin, *coordinates), 2)
+        cache[location] = distance
+    return distance
+
+
+def sort_key(sort, origin=None):
+    # Total order over candidates, missing values last and ties broken by
+    # relevance then directory order; keys are plain JSON so they fit in a cursor
+    if sort == "relevance":
+        return lambda c: (-c.score, c.position)
+    if sort == "experience":
+        return lambda c: (c.experience is None, -(c.experience or 0), -c.score, c.position)
+    if sort == "fee":
+        return lambda c: (c.fee is None, c.fee or 0, -c.score, c.position)
+    distances = {}
+
+    def by_distance(c):
+        distance = locality_distance(c.location, origin, distances)
+        return (distance is None, distance or 0, -c.score, c.position)
+    return by_distance
+
+
+def query_hash(query, origin):
+    # Which result list a cursor belongs to: the same locations and
+    # specializations (in any order or case) from the same origin
+    locations, specializations = query
+    raw = json.dumps([sorted(v.strip().lower() for v in locations), sorted(v.strip().lower() for v in specializations),
+                      origin], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(sort, query, key):
+    raw = json.dumps([sort, query, list(key)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort, query):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_query, key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor was issued for sort={cursor_sort}, not sort={sort}")
+    if cursor_query != query:
+        raise ValueError("Cursor was issued for a different location, specialization or lat/lon")
+    return tuple(key)
+
+
+def split_values(values):
+    # Repeated and/or comma-separated query arguments: ?location=Kurla,Chembur&location=Sion
+    if isinstance(values, str):
+        values = [values]
+    return [v.strip() for value in values for v in value.split(",") if v.strip()]
+
+
+def parse_fields(fields, columns):
+    fields = split_values(fields or [])
+    if not fields:
+        return None
+    unknown = [field for field in fields if field not in columns and field != DISTANCE_FIELD]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}, expected some of {list(columns)}")
+    return fields
+
+
+def parse_origin(origin):
+    try:
+        lat, lon = parse_coordinates(origin)
+    except (ValueError, TypeError):
+        raise ValueError("lat and lon must be numbers in degrees")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):  # also false for NaN
+        raise ValueError("lat must be between -90 and 90 and lon between -180 and 180")
+    return lat, lon
+
+
+def doctor_page(candidates, load, columns, sort="relevance", limit=DOCTOR_PAGE_SIZE, cursor=None, fields=None,
+                origin=None, query=((), ())):
+    # One page of matches: the `limit` best under `sort` after `cursor`, picked
+    # with a bounded heap so only that page is ever sorted, loaded and serialised.
+    # load(rows) -> records for the chosen candidates, in the same order.
+    # query is (locations, specializations); a cursor only continues that query.
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort '{sort}', expected one of {SORT_KEYS}")
+    try:
+        limit = int(limit)
+    except (ValueError, TypeError):
+        limit = 0
+    if not 1 <= limit <= DOCTOR_MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be an integer between 1 and {DOCTOR_MAX_PAGE_SIZE}")
+    if origin is not None:
+        origin = parse_origin(origin)
+    elif sort == "distance":
+        raise ValueError("sort=distance needs the user's location")
+    fields = parse_fields(fields, columns)
+    query = query_hash(query, origin)
+
+    key = sort_key(sort, origin)
+    matches = candidates
+    if cursor:
+        after = decode_cursor(cursor, sort, query)
+        matches = (c for c in candidates if key(c) > after)
+    top = heapq.nsmallest(limit + 1, matches, key=key)
+    more = len(top) > limit
+    top = top[:limit]
+
+    records = load([c.row for c in top])
+    distances = {}
+    doctors = []
+    for candidate, record in zip(top, records):
+        if origin is not None:
+            record[DISTANCE_FIELD] = locality_distance(candidate.location, origin, distances)
+        doctors.append({field: record.get(field) for field in fields} if fields else record)
+    return {
+        "doctors": doctors,
+        "total": len(candidates),
+        "next_cursor": encode_cursor(sort, query, key(top[-1])) if more else None,
+    }
@@ -1,4 +1,4 @@
-from groq import Groq
+from llm_clients import groq_client
 import base64
 
 
@@ -14,7 +14,7 @@ image_path = "images/medical_filter.png"
 # Getting the base64 string
 base64_image = encode_image(image_path)
 
-client = Groq()
+client = groq_client()
 
 system_message = """
 Your job is to classify medical waster
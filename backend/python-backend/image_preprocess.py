@@ -0,0 +1,120 @@
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from observability import get_logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, without it images are sent as uploaded
+    Image = None
+
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1536"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", "2"))  # 0 = run in the request thread
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png", "GIF": "image/gif"}
+if IMAGE_FORMAT not in MIME_TYPES:
+    raise ValueError(f"IMAGE_FORMAT must be one of {sorted(MIME_TYPES)}, got {IMAGE_FORMAT!r}")
+
+log = get_logger("image_preprocess")
+
+
+class PreparedImage:
+    def __init__(self, data, mime, bytes_before):
+        self.data = data
+        self.mime = mime
+        self.bytes_before = bytes_before
+        self.bytes_after = len(data)
+
+
+def sniff_mime(data):
+    head = bytes(data[:12])
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"GIF8"):
+        return "image/gif"
+    return "image/jpeg"
+
+
+def _reencode(data, max_side, fmt, quality):
+    # Runs in a worker process: decode, honour the EXIF rotation, shrink, and
+    # re-encode without any metadata. Returns the new bytes and whether the
+    # original has to be replaced (too large, or in a format we don't send)
+    with Image.open(io.BytesIO(data)) as img:
+        must_replace = max(img.size) > max_side or img.format not in MIME_TYPES
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, format=fmt, quality=quality, optimize=True)
+        return out.getvalue(), must_replace
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=IMAGE_PREPROCESS_WORKERS)
+    return _pool
+
+
+def _prepared(data, result, fmt):
+    if result is not None:
+        processed, must_replace = result
+        if must_replace or len(processed) < len(data):
+            prepared = PreparedImage(processed, MIME_TYPES[fmt], len(data))
+            log.debug("image.preprocessed", bytes_before=prepared.bytes_before, bytes_after=prepared.bytes_after)
+            return prepared
+        log.debug("image.kept_original", image_bytes=len(data), reencoded_bytes=len(processed))
+    return PreparedImage(data, sniff_mime(data), len(data))
+
+
+def preprocess_image(upload, max_side=IMAGE_MAX_SIDE, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY):
+    data = upload.read()
+    if Image is None:
+        return _prepared(data, None, fmt)
+
+    try:
+        if IMAGE_PREPROCESS_WORKERS > 0:
+            result = _get_pool().submit(_reencode, data, max_side, fmt, quality).result()
+        else:
+            result = _reencode(data, max_side, fmt, quality)
+    except Exception as e:
+        log.warning("image.preprocess_failed", error=str(e))
+        result = None
+    return _prepared(data, result, fmt)
+
+
+async def preprocess_image_async(upload, max_side=IMAGE_MAX_SIDE, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY):
+    data = upload.read()
+    if Image is None:
+        return _prepared(data, None, fmt)
+
+    try:
+        if IMAGE_PREPROCESS_WORKERS > 0:
+            future = _get_pool().submit(_reencode, data, max_side, fmt, quality)
+            result = await asyncio.wrap_future(future)
+        else:
+            result = await asyncio.to_thread(_reencode, data, max_side, fmt, quality)
+    except Exception as e:
+        log.warning("image.preprocess_failed", error=str(e))
+        result = None
+    return _prepared(data, result, fmt)
@@ -0,0 +1,49 @@
+# Compiles the doctor and hospital CSVs (with their upsert/change logs applied)
+# into the SQLite directory store that get_doctors and get_beds query.
+#
+#   python ingest_directory.py
+#   python ingest_directory.py --doctors data/mumbai_doctors_data.csv --db data/directory.db
+#
+# Re-run after replacing a CSV; running servers pick up the new file within
+# STORE_POLL_SECONDS. Delta crawls and /update_beds keep the store current in between.
+import argparse
+import os
+import time
+from directory_store import DIRECTORY_DB, build
+from retreive_doctor_data import DOCTORS_CSV, DoctorDirectory
+from retreive_beds import BEDS_CSV, BED_UPDATES_FILE, BedInventory
+
+
+def ingest(db_path, doctors_csv=None, beds_csv=None, bed_updates_file=BED_UPDATES_FILE):
+    start = time.perf_counter()
+    doctors = hospitals = None
+    sources = {}
+    if doctors_csv:
+        doctors = DoctorDirectory.from_csv(doctors_csv).records()
+        sources["doctors"] = doctors_csv
+    if beds_csv:
+        inventory = BedInventory(beds_csv, bed_updates_file)
+        hospitals = (inventory.key, inventory.snapshot().hospitals)
+        sources["beds"] = beds_csv
+    build(db_path, doctors, hospitals, sources)
+    print(f"Ingested {len(doctors or [])} doctors and {len(hospitals[1]) if hospitals else 0} hospitals "
+          f"into {db_path} in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the SQLite doctor/hospital directory store")
+    parser.add_argument("--db", default=DIRECTORY_DB)
+    parser.add_argument("--doctors", default=DOCTORS_CSV, help="doctor CSV, '' to leave doctors out")
+    parser.add_argument("--beds", default=BEDS_CSV, help="hospital beds CSV, '' to leave beds out")
+    parser.add_argument("--bed-updates", default=BED_UPDATES_FILE)
+    args = parser.parse_args()
+
+    beds_csv = args.beds
+    if beds_csv and not os.path.exists(beds_csv):
+        print(f"{beds_csv} not found, ingesting doctors only")
+        beds_csv = None
+    ingest(args.db, args.doctors or None, beds_csv, args.bed_updates)
+
+
+if __name__ == "__main__":
+    main()
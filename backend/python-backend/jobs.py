@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import httpx
+from observability import get_logger, bind_context
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "64"))  # queued + running before new jobs are refused
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))  # how long finished results are kept
+JOB_CALLBACK_TIMEOUT = float(os.getenv("JOB_CALLBACK_TIMEOUT", "10"))
+JOB_CALLBACK_ATTEMPTS = int(os.getenv("JOB_CALLBACK_ATTEMPTS", "3"))
+JOB_CALLBACK_WORKERS = int(os.getenv("JOB_CALLBACK_WORKERS", "2"))
+# Comma-separated hosts callbacks may go to; unset = callbacks are refused
+JOB_CALLBACK_HOSTS = {h.strip() for h in os.getenv("JOB_CALLBACK_HOSTS", "").split(",") if h.strip()}
+
+log = get_logger("jobs")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, callback_url=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.callback_url = callback_url
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self):
+        body = {"job_id": self.id, "kind": self.kind, "status": self.status, "created": self.created}
+        if self.done:
+            body["finished"] = self.finished
+        if self.status == "succeeded":
+            body["result"] = self.result
+        elif self.status == "failed":
+            body["error"] = self.error
+        return body
+
+
+class JobStore:
+    # Jobs by id. Finished jobs are dropped JOB_TTL_SECONDS after they finish,
+    # oldest first; queued and running jobs never expire.
+    def __init__(self, ttl_seconds=JOB_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}
+        self._finished = OrderedDict()  # id -> finish time, in finish order
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        while self._finished:
+            job_id, finished = next(iter(self._finished.items()))
+            if now - finished < self.ttl_seconds:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    def add(self, job, max_pending):
+        with self._lock:
+            self._purge(time.time())
+            if len(self._jobs) - len(self._finished) >= max_pending:
+                raise JobQueueFull(f"{max_pending} jobs already pending")
+            self._jobs[job.id] = job
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge(time.time())
+            return self._jobs.get(job_id)
+
+    def finish(self, job, status, result=None, error=None):
+        with self._lock:
+            job.status = status
+            job.result = result
+            job.error = error
+            job.finished = time.time()
+            self._finished[job.id] = job.finished
+
+    def pending(self):
+        with self._lock:
+            return len(self._jobs) - len(self._finished)
+
+
+store = JobStore()
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+# Callbacks retry with backoff, so they get their own threads instead of holding a job worker
+_callback_executor = ThreadPoolExecutor(max_workers=JOB_CALLBACK_WORKERS, thread_name_prefix="job-callback")
+
+
+def valid_callback(url):
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    return parsed.hostname in JOB_CALLBACK_HOSTS
+
+
+def _notify(job):
+    body = job.to_dict()
+    for attempt in range(1, JOB_CALLBACK_ATTEMPTS + 1):
+        try:
+            httpx.post(job.callback_url, json=body, timeout=JOB_CALLBACK_TIMEOUT).raise_for_status()
+            return
+        except httpx.HTTPError as e:
+            log.warning("job.callback_failed", job_id=job.id, attempt=attempt, error=str(e))
+            if attempt < JOB_CALLBACK_ATTEMPTS:
+                time.sleep(2 ** (attempt - 1))
+
+
+def _run(job, fn, args):
+    job.status = "running"
+    started = time.perf_counter()
+    try:
+        result = fn(*args)
+    except Exception as e:
+        log.exception("job.failed", job_id=job.id, kind=job.kind)
+        store.finish(job, "failed", error=str(e))
+    else:
+        store.finish(job, "succeeded", result=result)
+        log.info("job.succeeded", job_id=job.id, kind=job.kind, seconds=round(time.perf_counter() - started, 4))
+    if job.callback_url:
+        _callback_executor.submit(bind_context(_notify), job)
+
+
+def submit(kind, fn, *args, callback_url=None):
+    # fn(*args) must return something JSON-serialisable; it runs on the job pool
+    # in the submitting request's logging/metrics context
+    if callback_url and not valid_callback(callback_url):
+        raise ValueError(f"Callback URL not allowed: {callback_url}")
+    job = Job(kind, callback_url)
+    store.add(job, JOB_MAX_PENDING)
+    _executor.submit(bind_context(_run), job, fn, args)
+    log.info("job.queued", job_id=job.id, kind=kind, pending=store.pending())
+    return job
+
+
+def get_job(job_id):
+    return store.get(job_id)
+
+
+def wants_async(args, headers):
+    # ?mode=async, or the standard "Prefer: respond-async" header
+    if args.get("mode") == "async":
+        return True
+    return "respond-async" in headers.get("Prefer", "")
+
+
+def callback_url(form, headers):
+    return form.get("callback_url") or headers.get("X-Callback-URL")
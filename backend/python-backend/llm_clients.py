@@ -0,0 +1,123 @@
+import asyncio
+import os
+import threading
+import weakref
+import httpx
+from groq import Groq, AsyncGroq
+from openai import OpenAI, AsyncOpenAI
+from observability import get_logger
+
+# One client per provider for the whole process, so HTTP connections (and
+# their TLS sessions) are reused across requests instead of rebuilt per call
+
+# Point every provider at one local server, e.g. the stub used for load tests
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or (f"{LLM_BASE_URL}/v1" if LLM_BASE_URL else None)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or LLM_BASE_URL  # the Groq SDK adds /openai/v1 itself
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+LLM_WARMUP = os.getenv("LLM_WARMUP", "0") == "1"
+
+_PROVIDERS = {
+    "openai": (OpenAI, AsyncOpenAI, "OPENAI_API_KEY", OPENAI_BASE_URL, OPENAI_TIMEOUT),
+    "groq": (Groq, AsyncGroq, "GROQ_API_KEY", GROQ_BASE_URL, GROQ_TIMEOUT),
+}
+
+log = get_logger("llm_clients")
+
+_clients = {}
+_clients_lock = threading.Lock()
+# Async clients pool connections on the loop that opened them, so like the
+# semaphores they are kept per event loop (one loop per server process)
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> {provider: client}
+_semaphores = weakref.WeakKeyDictionary()  # event loop -> {name: semaphore}
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _build(provider, is_async):
+    sync_cls, async_cls, key_env, base_url, timeout = _PROVIDERS[provider]
+    timeout = httpx.Timeout(timeout, connect=10.0)
+    if is_async:
+        cls, http_client = async_cls, httpx.AsyncClient(limits=_limits(), timeout=timeout)
+    else:
+        cls, http_client = sync_cls, httpx.Client(limits=_limits(), timeout=timeout)
+    return cls(
+        api_key=os.getenv(key_env),
+        base_url=base_url,
+        timeout=timeout,
+        http_client=http_client,
+    )
+
+
+def get_client(provider, is_async=False):
+    if is_async:
+        clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+        client = clients.get(provider)
+        if client is None:
+            client = clients[provider] = _build(provider, is_async)
+        return client
+    client = _clients.get((provider, is_async))
+    if client is None:
+        with _clients_lock:
+            client = _clients.get((provider, is_async))
+            if client is None:
+                client = _build(provider, is_async)
+                _clients[(provider, is_async)] = client
+    return client
+
+
+def loop_semaphore(name, limit):
+    # An asyncio.Semaphore belongs to the loop it is first used on, so each
+    # loop (a reloaded server, a test's asyncio.run) gets its own
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(name)
+    if semaphore is None:
+        semaphore = semaphores[name] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+def openai_client():
+    return get_client("openai")
+
+
+def async_openai_client():
+    return get_client("openai", is_async=True)
+
+
+def groq_client():
+    return get_client("groq")
+
+
+def async_groq_client():
+    return get_client("groq", is_async=True)
+
+
+def warm_up(providers=("openai", "groq")):
+    # Opens (and authenticates) a pooled connection per provider before the
+    # first real request has to pay for DNS + TLS
+    for provider in providers:
+        try:
+            get_client(provider).models.list()
+            log.info("llm.warmed_up", provider=provider)
+        except Exception as e:
+            log.warning("llm.warm_up_failed", provider=provider, error=str(e))
+
+
+async def warm_up_async(providers=("openai", "groq")):
+    for provider in providers:
+        try:
+            await get_client(provider, is_async=True).models.list()
+            log.info("llm.warmed_up", provider=provider, is_async=True)
+        except Exception as e:
+            log.warning("llm.warm_up_failed", provider=provider, is_async=True, error=str(e))
@@ -0,0 +1,200 @@
+# Local stand-in for the Practo doctor listing, for exercising the scrapers.
+#
+#   python loadtest/listing_fixture.py generate loadtest/listing_pages --pages 50
+#   python loadtest/listing_fixture.py serve loadtest/listing_pages --port 8090
+#   python scraping.py --base-url "http://127.0.0.1:8090/mumbai/doctors?page={}" --output /tmp/doctors.csv
+#
+# `serve` answers /mumbai/doctors?page=N with <dir>/page-NNNN.html, and with an
+# empty listing past the last saved page, which is how the real site ends.
+# Saved real listing pages can be dropped into the directory under the same names.
+# Pages carry an ETag and Last-Modified and answer conditional requests with
+# 304, unless --no-validators is given.
+import argparse
+import hashlib
+import html
+import os
+import random
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+LOCALITIES = ["Andheri West", "Andheri East", "Bandra West", "Kurla West", "Chembur", "Ghatkopar East", "Dadar West",
+              "Worli", "Powai", "Mulund West", "Borivali West", "Kandivali East", "Malad West", "Goregaon East",
+              "Colaba", "Sion", "Matunga", "Mahim", "Santacruz East", "Vile Parle East"]
+SPECIALIZATIONS = ["Dentist", "Dermatologist", "General Physician", "Gynecologist/Obstetrician", "Pediatrician",
+                   "Orthopedist", "Cardiologist", "Ear-Nose-Throat (ENT) Specialist", "Homoeopath", "Ayurveda"]
+FIRST = ["Reshma", "Vaidehi", "Amit", "Sneha", "Rahul", "Priya", "Sanjay", "Kavita", "Nikhil", "Anjali", "Rohan", "Meera"]
+LAST = ["Phulwar", "Newaskar", "Shah", "Patil", "Mehta", "Iyer", "Desai", "Kulkarni", "Joshi", "Rao", "Naik", "Gupta"]
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Best Doctors in Mumbai - Practo</title>
+<script>window.__INITIAL_STATE__ = {padding};</script></head>
+<body><div class="c-header"><nav>{nav}</nav></div>
+<div class="listing-page"><div class="u-spacer--top"><h1 data-qa-id="results_heading">Doctors in Mumbai</h1></div>
+{cards}
+</div><footer>{nav}</footer></body></html>
+"""
+
+CARD_TEMPLATE = """<div class="listing-doctor-card" data-qa-id="doctor_card">
+  <div class="u-d-flex">
+    <div class="info-section">
+      <a href="{link}"><img class="doctor-photo" data-qa-id="doctor_profile_photo" src="{photo}" alt="{name}"></a>
+      <div><a href="{link}"><h2 class="doctor-name" data-qa-id="doctor_name">{name}</h2></a></div>
+      <div class="u-grey_3-text">
+        <div class="u-d-flex"><span>{specialization}</span></div>
+        <div data-qa-id="doctor_experience">{experience}</div>
+      </div>
+      <div class="u-bold u-d-inlineblock u-valign--middle">
+        <a href="/mumbai/{locality_slug}"><span data-qa-id="practice_locality">{locality},</span> <span data-qa-id="practice_city">Mumbai</span></a>
+        <span class="u-c-pointer" data-qa-id="doctor_clinic_name">{clinic}</span>
+      </div>
+      <div class="uv2-spacer--xs-top"><span data-qa-id="consultation_fee">{fee}</span> <span>Consultation fee at clinic</span></div>
+      <div class="u-spacer--top-thin">
+        <span class="o-label--success" data-qa-id="doctor_recommendation">{recommendation}</span>
+        <span data-qa-id="total_feedback">{stories}</span>
+      </div>
+    </div>
+    <div class="listing-doctor-card__actions"><span data-qa-id="availability_text">{availability}</span>
+      <button data-qa-id="book_button">Book Clinic Visit</button></div>
+  </div>
+</div>"""
+
+
+def make_card(rng, index, page_uid):
+    first, last = rng.choice(FIRST), rng.choice(LAST)
+    specialization = rng.choice(SPECIALIZATIONS)
+    locality = rng.choice(LOCALITIES)
+    slug = f"dr-{first}-{last}-{specialization.split()[0].split('/')[0]}-{index}".lower()
+    link = (f"/mumbai/doctor/{slug}?practice_id={600000 + index}&specialization=Doctor"
+            f"&referrer=doctor_listing&page_uid={page_uid}")
+    return CARD_TEMPLATE.format(
+        link=html.escape(link),
+        photo=f"https://imagesx.practo.com/providers/{slug}.jpg",
+        name=f"Dr. {first} {last}",
+        specialization=specialization,
+        experience=f"{rng.randint(1, 40)} years experience overall",
+        locality=locality,
+        locality_slug=locality.lower().replace(" ", "-"),
+        clinic=f"{last} {rng.choice(['Clinic', 'Dental Care', 'Skin Clinic', 'Nursing Home', 'Hospital'])}",
+        fee=f"₹{rng.choice([300, 400, 500, 700, 800, 1000, 1500])}",
+        recommendation=f"{rng.randint(70, 100)}%",
+        stories=f"{rng.randint(1, 400)} Patient Stories",
+        availability=rng.choice(["Available Today", "Available Tomorrow", "Available on Mon, 12 Feb"]),
+    )
+
+
+def render_page(cards):
+    nav = "".join(f'<a href="/mumbai/{s.lower()}">{s}</a>' for s in SPECIALIZATIONS)
+    padding = '{"listing": "' + "x" * 20000 + '"}'  # real pages carry a large inline state blob
+    return PAGE_TEMPLATE.format(padding=padding, nav=nav, cards="\n".join(cards))
+
+
+def generate(out_dir, pages, per_page=10, seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    for page in range(1, pages + 1):
+        page_uid = uuid.UUID(int=rng.getrandbits(128))
+        cards = [make_card(rng, (page - 1) * per_page + i, page_uid) for i in range(per_page)]
+        with open(os.path.join(out_dir, f"page-{page:04d}.html"), "w", encoding="utf-8") as f:
+            f.write(render_page(cards))
+    print(f"Wrote {pages} listing pages to {out_dir}")
+
+
+def page_path(pages_dir, page):
+    return os.path.join(pages_dir, f"page-{page:04d}.html")
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # set by serve()
+
+    def log_message(self, fmt, *args):
+        if self.config.verbose:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/mumbai/doctors":
+            return self._send(404, b"not found")
+        time.sleep(self.config.latency)
+        if random.random() < self.config.error_rate:
+            return self._send(503, b"try again later")
+
+        page = int(parse_qs(url.query).get("page", ["1"])[0])
+        path = page_path(self.config.pages_dir, page)
+        if not os.path.exists(path):
+            return self._send(200, render_page([]).encode("utf-8"))
+        with open(path, "rb") as f:
+            body = f.read()
+        if self.config.no_validators:
+            return self._send(200, body)
+
+        mtime = int(os.path.getmtime(path))
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        headers = [("ETag", etag), ("Last-Modified", formatdate(mtime, usegmt=True))]
+        if_none_match = self.headers.get("If-None-Match")
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_none_match is not None:
+            not_modified = etag in [tag.strip() for tag in if_none_match.split(",")]
+        elif if_modified_since is not None:
+            try:
+                not_modified = mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                not_modified = False
+        else:
+            not_modified = False
+        if not_modified:
+            return self._send(304, b"", headers)
+        self._send(200, body, headers)
+
+
+def serve(args):
+    ListingHandler.config = args
+    server = ThreadingHTTPServer((args.host, args.port), ListingHandler)
+    server.daemon_threads = True
+    print(f"Listing fixture serving {args.pages_dir} on http://{args.host}:{args.port}/mumbai/doctors?page=N")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Practo listing fixture pages and server")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="write synthetic listing pages")
+    gen.add_argument("pages_dir")
+    gen.add_argument("--pages", type=int, default=50)
+    gen.add_argument("--per-page", type=int, default=10)
+    gen.add_argument("--seed", type=int, default=0)
+
+    srv = commands.add_parser("serve", help="serve a directory of listing pages")
+    srv.add_argument("pages_dir")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8090)
+    srv.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    srv.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    srv.add_argument("--no-validators", action="store_true", help="no ETag/Last-Modified, never 304")
+    srv.add_argument("--verbose", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate(args.pages_dir, args.pages, args.per_page, args.seed)
+    else:
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# Load driver for the Flask/ASGI app: hits every route with realistic
+# payloads and reports throughput and p50/p95/p99 latency per endpoint.
+#
+#   python loadtest/stub_llm.py &                                   # fake OpenAI/Groq
+#   LLM_BASE_URL=http://127.0.0.1:8089 python app.py &               # app under test
+#   python loadtest/load_driver.py --url http://127.0.0.1:5000 --concurrency 32 --duration 60
+#
+# /update_beds writes real bed data, so it is left out unless asked for, against scratch files:
+#
+#   BED_UPDATES_FILE=/tmp/bed_updates.jsonl DIRECTORY_DB=/tmp/directory.db python app.py &
+#   python loadtest/load_driver.py --only update_beds --only doctors
+#
+# By default every request carries a unique image/recording/profile so the
+# response caches don't short-circuit the pipeline; --repeat-payloads sends
+# identical payloads to measure the cached path instead.
+import argparse
+import io
+import json
+import math
+import random
+import statistics
+import struct
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PROFILE = {
+    "Age": "34",
+    "weight (kg)": "72",
+    "Height (cm)": "168",
+    "Gender": "Female",
+    "Activity Level": "Lightly Active",
+    "Dietary Preferences": "Vegetarian",
+    "Allergies": "Peanuts",
+    "Taste Preferences": "Spicy",
+    "Medical History": "Hypothyroidism",
+    "Current Medical Conditions": "None",
+}
+
+# Mumbai coordinates the app is actually used from
+LOCATIONS = [(19.0760, 72.8777), (19.1136, 72.8697), (19.0522, 72.9005), (19.2307, 72.8567), (18.9220, 72.8347)]
+
+# Relative weights, roughly the app's traffic mix
+DEFAULT_MIX = {
+    "index": 1,
+    "plan_diet": 3,
+    "scan_img": 4,
+    "scan_batch": 1,
+    "chatbot": 2,
+    "upload_audio": 3,
+    "analyze_symptoms": 2,
+    "doctors": 2,
+}
+
+BATCH_IMAGES = 3  # packages per /scan_batch meal
+
+# Routes that write: /update_beds appends to BED_UPDATES_FILE, which ingest
+# replays into the directory store. Only sent when named with --only, and only
+# against a server pointed at scratch BED_UPDATES_FILE and DIRECTORY_DB paths.
+OPT_IN_MIX = {
+    "update_beds": 1,
+}
+
+
+def make_image(seed, side=1200):
+    # A noisy "photo", so JPEG compression and the preprocessing stage do real work
+    rng = random.Random(seed)
+    if Image is None:
+        return b"\xff\xd8\xff\xe0" + rng.randbytes(side * side // 4)
+    img = Image.effect_noise((side, side), 40 + seed % 20).convert("RGB")
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def make_audio(seed, seconds=4, rate=44100):
+    # Stereo tone with silence around it, like a short voice note
+    rng = random.Random(seed)
+    freq = rng.uniform(150, 400)
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        value = int(6000 * math.sin(2 * math.pi * freq * t)) if 0.5 < t < seconds - 0.5 else 0
+        frames += struct.pack("<hh", value, value)
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(bytes(frames))
+    return out.getvalue()
+
+
+class Payloads:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.counter = 0
+        self.lock = threading.Lock()
+        self.image = make_image(0)
+        self.audio = make_audio(0)
+
+    def seed(self):
+        if self.repeat:
+            return 0
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    def profile(self, seed):
+        return {**PROFILE, "Age": str(20 + seed % 50)} if seed else PROFILE
+
+    def location(self, seed):
+        lat, lon = LOCATIONS[seed % len(LOCATIONS)]
+        return json.dumps({"latitude": lat + (seed % 97) * 1e-4, "longitude": lon})
+
+    def image_bytes(self, seed, index=0):
+        # A few unique bytes at the end are enough to make the content hash differ
+        return self.image + struct.pack("<II", seed, index) if seed else self.image
+
+    def audio_bytes(self, seed):
+        return make_audio(seed) if seed else self.audio
+
+
+def request_for(name, payloads):
+    seed = payloads.seed()
+    if name == "index":
+        return "GET", "/", {}
+    if name == "plan_diet":
+        return "POST", "/plan_diet", {"json": payloads.profile(seed)}
+    if name == "scan_img":
+        return "POST", "/scan_img", {
+            "files": {"image": ("meal.jpg", payloads.image_bytes(seed), "image/jpeg")},
+            "data": {"description": "I am going to eat the whole pack",
+                     "user_Details": json.dumps(payloads.profile(seed))},
+        }
+    if name == "scan_batch":
+        return "POST", "/scan_batch", {
+            "files": [("images", (f"meal-{i}.jpg", payloads.image_bytes(seed, i), "image/jpeg"))
+                      for i in range(BATCH_IMAGES)],
+            "data": {"description": "Everything in tonight's dinner",
+                     "user_Details": json.dumps(payloads.profile(seed))},
+        }
+    if name == "chatbot":
+        return "POST", "/chatbot", {"json": {"prompt": "Is poha a good breakfast for weight loss?",
+                                             "profile": payloads.profile(seed)}}
+    if name == "upload_audio":
+        return "POST", "/upload_audio", {"files": {"audio": ("audio.wav", payloads.audio_bytes(seed), "audio/wav")}}
+    if name == "analyze_symptoms":
+        return "POST", "/analyze_symptoms", {
+            "files": {"audio": ("audio.wav", payloads.audio_bytes(seed), "audio/wav")},
+            "data": {"user_Details": json.dumps(payloads.profile(seed)),
+                     "ingredients": json.dumps(["wheat flour", "palm oil", "salt"]),
+                     "location": payloads.location(seed)},
+        }
+    if name == "update_beds":
+        return "POST", "/update_beds", {"json": {"_id": seed % 50, "Available Bed Count": seed % 40}}
+    if name == "doctors":
+        lat, lon = LOCATIONS[seed % len(LOCATIONS)]
+        return "GET", "/doctors", {"params": {
+            "location": "Kurla,Chembur,Andheri", "specialization": "Dentist,General Physician",
+            "sort": ["relevance", "experience", "fee", "distance"][seed % 4], "lat": lat, "lon": lon, "limit": 20,
+        }}
+    raise ValueError(name)
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def run(args):
+    if args.only:
+        mix = {name: weight for name, weight in {**DEFAULT_MIX, **OPT_IN_MIX}.items() if name in args.only}
+    else:
+        mix = dict(DEFAULT_MIX)
+    names, weights = list(mix), list(mix.values())
+    payloads = Payloads(args.repeat_payloads)
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    remaining = [args.requests] if args.requests else None
+
+    def worker(worker_id):
+        rng = random.Random(worker_id)
+        with httpx.Client(base_url=args.url, timeout=args.timeout) as client:
+            while time.monotonic() < deadline:
+                if remaining is not None:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                name = rng.choices(names, weights)[0]
+                method, path, kwargs = request_for(name, payloads)
+                start = time.perf_counter()
+                try:
+                    response = client.request(method, path, **kwargs)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies[name].append(elapsed)
+                    errors[name] += failed
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    wall = time.monotonic() - started
+
+    report = {"wall_s": wall, "concurrency": args.concurrency, "endpoints": {}}
+    for name in names:
+        values = latencies[name]
+        report["endpoints"][name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "throughput_rps": len(values) / wall if wall else 0.0,
+            "mean_s": statistics.fmean(values) if values else float("nan"),
+            "p50_s": percentile(values, 50),
+            "p95_s": percentile(values, 95),
+            "p99_s": percentile(values, 99),
+        }
+    total = sum(len(v) for v in latencies.values())
+    report["total"] = {"requests": total, "errors": sum(errors.values()), "throughput_rps": total / wall if wall else 0.0}
+    return report
+
+
+def print_report(report):
+    print(f"{'endpoint':18s} {'reqs':>7s} {'errs':>6s} {'rps':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:18s} {stats['requests']:7d} {stats['errors']:6d} {stats['throughput_rps']:8.2f} "
+              f"{stats['p50_s'] * 1000:9.1f} {stats['p95_s'] * 1000:9.1f} {stats['p99_s'] * 1000:9.1f}")
+    total = report["total"]
+    print(f"{'total':18s} {total['requests']:7d} {total['errors']:6d} {total['throughput_rps']:8.2f}"
+          f"   ({report['wall_s']:.1f}s, concurrency {report['concurrency']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load driver for the Aarogya AI backend")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run for")
+    parser.add_argument("--requests", type=int, help="stop after this many requests instead")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--only", action="append", choices=sorted({**DEFAULT_MIX, **OPT_IN_MIX}),
+                        help="restrict to these endpoints; the only way to include update_beds")
+    parser.add_argument("--repeat-payloads", action="store_true", help="send identical payloads (cache-hit path)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
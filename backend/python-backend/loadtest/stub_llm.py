@@ -0,0 +1,247 @@
+# Local stand-in for the OpenAI and Groq APIs, for load tests and benchmarks.
+#
+#   python loadtest/stub_llm.py --port 8089 --latency lognormal:0.0,0.5 --error-rate 0.01
+#   LLM_BASE_URL=http://127.0.0.1:8089 python app.py
+#
+# Speaks chat completions (plain, streamed and structured-output/parse) and
+# audio transcriptions under both the OpenAI (/v1/...) and Groq
+# (/openai/v1/...) paths. Responses are replayed from a recordings file, or
+# from built-in canned responses when nothing was recorded for a request.
+#
+# Record mode forwards every request to the real provider and saves the
+# responses for later replay:
+#
+#   python loadtest/stub_llm.py --record --recordings loadtest/recordings.json
+import argparse
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+UPSTREAMS = {"openai": "https://api.openai.com", "groq": "https://api.groq.com"}
+
+CANNED = {
+    "chat:diet_format": json.dumps({
+        "diet_nutritions": ["calories: 2200", "carbohydrates: 275", "proteins: 90", "fats: 70", "sodium: 2000",
+                            "calcium: 1000", "copper: 0.9", "iron: 17", "manganese: 2.3", "phosphorus: 700",
+                            "potassium: 3500"],
+        "suggestions": ["Moong dal chilla", "Vegetable poha", "Rajma chawal", "Palak paneer with roti"],
+    }),
+    "chat:food_info_extraction_format": json.dumps({
+        "nutritional_facts": ["calories: 385kcal", "carbohydrates: 55g", "proteins: 8g", "fats: 15g",
+                              "fiber: 2g", "cholesterol: 0g", "sodium: 0.9g", "sugar: 3g"],
+        "ingredients": ["wheat flour", "palm oil", "salt", "spices"],
+        "feedback": "High in sodium; fine occasionally for this profile.",
+        "final_thoughts": "OK in moderation.",
+    }),
+    "chat": "Eat more fibre: dal, vegetables and whole grains. Limit fried snacks and sugary drinks.",
+    "transcription": "I have had a headache and mild fever since yesterday.",
+}
+
+
+def parse_latency(spec):
+    # fixed:S | uniform:LO,HI | normal:MEAN,SD | lognormal:MU,SIGMA (seconds)
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class Recordings:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        self.cycles = {key: itertools.cycle(values) for key, values in self.entries.items() if values}
+
+    def next(self, key):
+        with self.lock:
+            cycle = self.cycles.get(key)
+            return next(cycle) if cycle else None
+
+    def add(self, key, value):
+        with self.lock:
+            self.entries.setdefault(key, []).append(value)
+            self.cycles[key] = itertools.cycle(self.entries[key])
+            if self.path:
+                with open(self.path, "w", encoding="utf-8") as f:
+                    json.dump(self.entries, f, indent=2)
+
+
+def chat_key(body):
+    response_format = body.get("response_format") or {}
+    schema_name = (response_format.get("json_schema") or {}).get("name")
+    return f"chat:{schema_name}" if schema_name else "chat"
+
+
+def completion_body(model, content):
+    words = len(content.split())
+    return {
+        "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content, "refusal": None},
+            "logprobs": None,
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 200, "completion_tokens": words, "total_tokens": 200 + words},
+    }
+
+
+def stream_chunks(model, content, include_usage=False):
+    base = {"id": f"chatcmpl-stub-{random.getrandbits(32):08x}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": model}
+    for i, word in enumerate(content.split(" ")):
+        delta = {"content": word if i == 0 else " " + word}
+        yield {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    if include_usage:
+        words = len(content.split())
+        yield {**base, "choices": [], "usage": {"prompt_tokens": 200, "completion_tokens": words,
+                                                "total_tokens": 200 + words}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    config = None  # set by main()
+
+    def log_message(self, fmt, *args):
+        if self.config.verbose:
+            super().log_message(fmt, *args)
+
+    def _provider(self):
+        return "groq" if self.path.startswith("/openai/") else "openai"
+
+    def _route(self):
+        path = self.path.split("?")[0]
+        if path.startswith("/openai"):
+            path = path[len("/openai"):]
+        return path
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self._route() == "/v1/models":
+            return self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        route = self._route()
+
+        if self.config.record:
+            return self._forward(route, body)
+
+        time.sleep(self.config.latency())
+        if random.random() < self.config.error_rate:
+            status = random.choice([429, 500, 503])
+            return self._send_json(status, {"error": {"message": "stub injected error", "type": "server_error"}})
+
+        if route == "/v1/chat/completions":
+            request = json.loads(body)
+            key = chat_key(request)
+            content = self.config.recordings.next(key) or CANNED.get(key) or CANNED["chat"]
+            if request.get("stream"):
+                include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+                return self._stream(request.get("model", "stub"), content, include_usage)
+            return self._send_json(200, completion_body(request.get("model", "stub"), content))
+        if route == "/v1/audio/transcriptions":
+            text = self.config.recordings.next("transcription") or CANNED["transcription"]
+            return self._send_json(200, {"task": "transcribe", "language": "english", "duration": 3.0,
+                                         "text": text, "segments": []})
+        self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def _stream(self, model, content, include_usage=False):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = [json.dumps(chunk) for chunk in stream_chunks(model, content, include_usage)] + ["[DONE]"]
+        for event in events:
+            data = f"data: {event}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _forward(self, route, body):
+        provider = self._provider()
+        url = UPSTREAMS[provider] + self.path
+        headers = {name: self.headers[name] for name in ("Authorization", "Content-Type") if self.headers.get(name)}
+        request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+
+        if status == 200:
+            try:
+                if route == "/v1/chat/completions":
+                    key = chat_key(json.loads(body))
+                    self.config.recordings.add(key, json.loads(payload)["choices"][0]["message"]["content"])
+                elif route == "/v1/audio/transcriptions":
+                    self.config.recordings.add("transcription", json.loads(payload)["text"])
+            except (ValueError, KeyError) as e:
+                print(f"Could not record {route} response: {e}")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI/Groq stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--recordings", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings.json"))
+    parser.add_argument("--latency", default="lognormal:0.0,0.4", help="fixed:S, uniform:LO,HI, normal:MEAN,SD or lognormal:MU,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429/5xx")
+    parser.add_argument("--record", action="store_true", help="forward to the real APIs and save the responses")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    args.latency = parse_latency(args.latency)
+    args.recordings = Recordings(args.recordings)
+    StubHandler.config = args
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    mode = "recording" if args.record else "replaying"
+    print(f"Stub LLM server {mode} on http://{args.host}:{args.port} (set LLM_BASE_URL to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import re
+
+# Spelling variants -> the spelling used in the doctor/hospital data. Keys and
+# values are compared with spaces removed, so "Santa Cruz"/"Santacruz" and
+# "Vile Parle"/"Vileparle" already agree without an entry here.
+ALIASES = {
+    "kandivli": "kandivali",
+    "borivli": "borivali",
+    "bombay central": "mumbai central",
+    "pedder road": "peddar road",
+    "mira bhayander": "mira bhayandar",
+    "bhayander": "mira bhayandar",
+    "lokhandwala complex": "lokhandwala",
+    "ghatkoper": "ghatkopar",
+    "vikroli": "vikhroli",
+    "sewri": "sewree",
+    "worli seaface": "worli",
+    "marine drive": "marine lines",
+    "vt": "fort",
+    "cst": "fort",
+    "kanjur": "kanjurmarg",
+    "nalasopara": "nala sopara",
+    "bkc": "bandra kurla complex",
+}
+
+# Trailing words naming the side of the railway line
+SUFFIXES = {"e": "east", "east": "east", "w": "west", "west": "west"}
+
+MIN_SIMILARITY = 0.4  # trigram Jaccard below this is not a match
+PART_MATCH_SCORE = 0.85  # "parle" in "vile parle": the query names part of the locality
+MIN_PART_LENGTH = 3
+OTHER_SIDE_PENALTY = 0.9  # "kurla" asked, "kurla west" found (or the reverse)
+MAX_CACHED_QUERIES = 4096
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def _compact(text):
+    return text.replace(" ", "")
+
+
+_ALIASES = {_compact(k): _compact(v) for k, v in ALIASES.items()}
+
+
+def normalize_locality(text):
+    # "Andheri (E)," -> ("andheri", "east"); "Santa Cruz" -> ("santacruz", None).
+    # The base is compacted (no spaces) so spacing variants compare equal.
+    words = _NON_WORD.sub(" ", str(text).lower()).split()
+    suffix = None
+    if len(words) > 1 and words[-1] in SUFFIXES:
+        suffix = SUFFIXES[words.pop()]
+    base = _compact(" ".join(words))
+    return _ALIASES.get(base, base), suffix
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LocalityMatcher:
+    # Ranks the distinct locality values of a dataset against a query. Values
+    # are grouped by normalised base; a trigram index over the bases catches
+    # misspelt queries. Results are memoised per query.
+    def __init__(self, values):
+        self.bases = {}  # base -> [(value, suffix)]
+        for value in values:
+            base, suffix = normalize_locality(value)
+            if base:
+                self.bases.setdefault(base, []).append((value, suffix))
+        self.grams = {base: trigrams(base) for base in self.bases}
+        self.index = {}  # trigram -> bases containing it
+        for base, grams in self.grams.items():
+            for gram in grams:
+                self.index.setdefault(gram, []).append(base)
+        self._matches = {}
+
+    def _base_scores(self, base):
+        scores = {}
+        if base in self.bases:
+            scores[base] = 1.0
+        # Part of a longer locality name, what plain substring matching used to find
+        if len(base) >= MIN_PART_LENGTH:
+            for candidate in self.bases:
+                if candidate != base and base in candidate:
+                    scores[candidate] = PART_MATCH_SCORE
+        if base in self.bases:
+            return scores
+        # Not a name we know: probably misspelt, rank by trigram similarity
+        grams = trigrams(base)
+        shared = {}
+        for gram in grams:
+            for candidate in self.index.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        for candidate, count in shared.items():
+            similarity = count / (len(grams) + len(self.grams[candidate]) - count)
+            if similarity >= MIN_SIMILARITY and similarity > scores.get(candidate, 0):
+                scores[candidate] = similarity
+        return scores
+
+    def match(self, query):
+        # [(value, score)], best first; an explicit East/West never matches the other side
+        matches = self._matches.get(query)
+        if matches is None:
+            base, suffix = normalize_locality(query)
+            matches = []
+            if base:
+                for candidate, score in self._base_scores(base).items():
+                    for value, value_suffix in self.bases[candidate]:
+                        if suffix and value_suffix and suffix != value_suffix:
+                            continue
+                        matches.append((value, score if suffix == value_suffix else score * OTHER_SIDE_PENALTY))
+            matches.sort(key=lambda match: -match[1])
+            if len(self._matches) >= MAX_CACHED_QUERIES:
+                self._matches.clear()
+            self._matches[query] = matches
+        return matches
+
+    def match_all(self, queries):
+        # value -> best score over all the queries
+        best = {}
+        for query in queries:
+            for value, score in self.match(query):
+                if score > best.get(value, 0):
+                    best[value] = score
+        return best
@@ -0,0 +1,194 @@
+import json
+import math
+from functools import lru_cache
+
+# Offline gazetteer of the Mumbai localities we have doctor and bed data for
+# (approximate centre of each locality, lat/long in degrees)
+LOCALITIES = {
+    "Borivali": (19.2307, 72.8567),
+    "Dahisar": (19.2502, 72.8592),
+    "Kandivali": (19.2048, 72.8526),
+    "Malad": (19.1874, 72.8484),
+    "Goregaon": (19.1663, 72.8526),
+    "Bhandup": (19.1437, 72.9376),
+    "Vikhroli": (19.1110, 72.9279),
+    "Mulund": (19.1726, 72.9425),
+    "Kurla": (19.0726, 72.8845),
+    "Chembur": (19.0522, 72.9005),
+    "Ghatkopar": (19.0860, 72.9081),
+    "Andheri": (19.1136, 72.8697),
+    "Santacruz": (19.0810, 72.8417),
+    "Bandra": (19.0596, 72.8295),
+    "Jogeshwari": (19.1372, 72.8487),
+    "Colaba": (18.9067, 72.8147),
+    "Byculla": (18.9793, 72.8323),
+    "Mazgaon": (18.9656, 72.8429),
+    "Dadar": (19.0178, 72.8478),
+    "Parel": (19.0009, 72.8414),
+    "Worli": (19.0166, 72.8172),
+    "Prabhadevi": (19.0163, 72.8297),
+    "Sion": (19.0390, 72.8619),
+    "Dharavi": (19.0380, 72.8538),
+    "Matunga": (19.0271, 72.8505),
+    "Tardeo": (18.9697, 72.8137),
+    "Agripada": (18.9760, 72.8260),
+    "Chinchpokli": (18.9863, 72.8330),
+    "Girgaon": (18.9540, 72.8150),
+    "Marine Lines": (18.9446, 72.8235),
+    "Fort": (18.9345, 72.8353),
+    "Mahim": (19.0410, 72.8400),
+    "Powai": (19.1176, 72.9060),
+    "Mira Road": (19.2813, 72.8561),
+    "Mira Bhayandar": (19.2950, 72.8540),
+    "Charni Road": (18.9517, 72.8187),
+    "Vile Parle": (19.0999, 72.8446),
+    "Khar": (19.0710, 72.8370),
+    "Mumbai Central": (18.9690, 72.8205),
+    "Juhu": (19.1075, 72.8263),
+    "Lokhandwala": (19.1420, 72.8250),
+    "Oshiwara": (19.1480, 72.8350),
+    "Versova": (19.1310, 72.8150),
+    "Seven Bungalows": (19.1300, 72.8200),
+    "Peddar Road": (18.9700, 72.8090),
+    "Kemps Corner": (18.9625, 72.8060),
+    "Cumballa Hill": (18.9640, 72.8070),
+    "Malabar Hill": (18.9548, 72.7985),
+    "Walkeshwar": (18.9470, 72.7950),
+    "Nana Chowk": (18.9650, 72.8140),
+    "Grant Road": (18.9630, 72.8160),
+    "Opera House": (18.9545, 72.8170),
+    "Lamington Road": (18.9610, 72.8210),
+    "Haji Ali": (18.9780, 72.8140),
+    "Lower Parel": (18.9950, 72.8300),
+    "Lalbaug": (18.9930, 72.8390),
+    "Jacob Circle": (18.9800, 72.8260),
+    "Nagpada": (18.9690, 72.8280),
+    "Umerkhadi": (18.9600, 72.8370),
+    "Mohammed Ali Road": (18.9580, 72.8340),
+    "Dhobi Talao": (18.9440, 72.8300),
+    "Kala Ghoda": (18.9280, 72.8320),
+    "Churchgate": (18.9322, 72.8264),
+    "Wadala": (19.0197, 72.8646),
+    "Bandra Kurla Complex": (19.0660, 72.8650),
+    "Kalina": (19.0770, 72.8600),
+    "Chunabhatti": (19.0510, 72.8750),
+    "Tilak Nagar": (19.0660, 72.8930),
+    "Govandi": (19.0553, 72.9150),
+    "Deonar": (19.0500, 72.9100),
+    "Marol": (19.1197, 72.8827),
+    "Saki Naka": (19.1040, 72.8880),
+    "JB Nagar": (19.1090, 72.8700),
+    "Chandivali": (19.1090, 72.8990),
+    "Kanjurmarg": (19.1290, 72.9330),
+    "Kalyan": (19.2437, 73.1355),
+    "Badlapur": (19.1550, 73.2650),
+}
+
+NEAREST_K = 2  # how many localities to search in, at most
+RADIUS_KM = 4.0  # extra localities must be within this distance; the nearest is always returned
+COORDINATE_PRECISION = 3  # ~110 m, resolutions are memoized on rounded coordinates
+CELL_DEGREES = 0.05  # grid cell size of the spatial index, ~5 km
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class LocalityIndex:
+    # Uniform lat/long grid; a query scans rings of cells outward from the
+    # query cell and stops once no unscanned cell can hold a closer locality
+    def __init__(self, localities, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        for name, (lat, lon) in localities.items():
+            self.cells.setdefault(self._cell(lat, lon), []).append((name, lat, lon))
+        rows = [cell[0] for cell in self.cells]
+        cols = [cell[1] for cell in self.cells]
+        self.bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def _ring(self, row, col, r):
+        if r == 0:
+            yield row, col
+            return
+        for c in range(col - r, col + r + 1):
+            yield row - r, c
+            yield row + r, c
+        for rr in range(row - r + 1, row + r):
+            yield rr, col - r
+            yield rr, col + r
+
+    def nearest(self, lat, lon, k=NEAREST_K, radius_km=RADIUS_KM):
+        row, col = self._cell(lat, lon)
+        min_row, max_row, min_col, max_col = self.bounds
+        max_r = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+        # Shortest distance covered by one cell, used to bound unscanned rings
+        cell_km = haversine(lat, lon, lat + self.cell_degrees, lon)
+        cell_km = min(cell_km, haversine(lat, lon, lat, lon + self.cell_degrees))
+
+        found = []
+        if not (min_row <= row <= max_row and min_col <= col <= max_col):
+            # Far outside the city the rings would be mostly empty, just scan everything
+            found = [(haversine(lat, lon, llat, llon), name)
+                     for entries in self.cells.values() for name, llat, llon in entries]
+            max_r = -1
+        for r in range(max_r + 1):
+            for cell in self._ring(row, col, r):
+                for name, llat, llon in self.cells.get(cell, ()):
+                    found.append((haversine(lat, lon, llat, llon), name))
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= r * cell_km:
+                    break
+        found.sort()
+        return [(name, distance) for distance, name in found[:k] if distance <= radius_km] or [
+            (name, distance) for distance, name in found[:1]
+        ]
+
+
+_index = LocalityIndex(LOCALITIES)
+
+
+def _first(mapping, keys):
+    for key in keys:
+        if key in mapping:
+            return mapping[key]
+    raise ValueError(f"Location is missing one of {keys}")
+
+
+def parse_coordinates(location):
+    # Accepts the app's {"latitude", "longitude"} payload (as dict or JSON
+    # string), an expo location object with "coords", or a (lat, long) pair
+    if isinstance(location, (str, bytes)):
+        location = json.loads(location)
+    if isinstance(location, dict):
+        location = location.get("coords", location)
+        lat = _first(location, ("latitude", "lattitude", "lat"))
+        lon = _first(location, ("longitude", "lng", "lon"))
+    else:
+        lat, lon = location
+    return float(lat), float(lon)
+
+
+@lru_cache(maxsize=4096)
+def _resolve(lat, lon, k, radius_km):
+    return tuple(name for name, _ in _index.nearest(lat, lon, k, radius_km))
+
+
+def resolve_localities(location, k=NEAREST_K, radius_km=RADIUS_KM):
+    lat, lon = parse_coordinates(location)
+    return list(_resolve(round(lat, COORDINATE_PRECISION), round(lon, COORDINATE_PRECISION), k, radius_km))
+
+
+if __name__ == "__main__":
+    location = {
+        "lattitude": 19.0759837,
+        "longitude": 72.8776559
+    }
+    print(resolve_localities(location))
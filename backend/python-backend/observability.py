@@ -0,0 +1,203 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Upstream calls take seconds, local stages milliseconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+REQUESTS = Counter("aarogya_requests_total", "HTTP requests handled", ["route", "method", "status"])
+REQUEST_SECONDS = Histogram("aarogya_request_seconds", "HTTP request latency", ["route"], buckets=LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram("aarogya_stage_seconds", "Latency of one pipeline stage", ["route", "stage"],
+                          buckets=LATENCY_BUCKETS)
+LLM_SECONDS = Histogram("aarogya_llm_seconds", "Upstream LLM call latency", ["model"], buckets=LATENCY_BUCKETS)
+LLM_CALLS = Counter("aarogya_llm_calls_total", "Upstream LLM calls", ["model", "outcome"])
+LLM_TOKENS = Counter("aarogya_llm_tokens_total", "Tokens used by upstream LLM calls", ["model", "kind"])
+# Hit rate of a response cache: rate of result="hit"/"disk_hit" over all its lookups
+CACHE_LOOKUPS = Counter("aarogya_cache_lookups_total", "Response cache lookups", ["cache", "result"])
+CACHE_EVICTIONS = Counter("aarogya_cache_evictions_total", "Response cache entries evicted or expired",
+                          ["cache", "reason"])
+CACHE_ENTRIES = Gauge("aarogya_cache_entries", "Entries held in memory by a response cache", ["cache"])
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# The request being handled on this thread/task: id, route, and the stage
+# timings and token counts collected so far for its summary log line
+_request = contextvars.ContextVar("request", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        context = _request.get()
+        if context is not None:
+            entry["request_id"] = context["id"]
+            entry["route"] = context["route"]
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["error"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_root = logging.getLogger("aarogya")
+if not _root.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(JsonFormatter())
+    _root.addHandler(_handler)
+    _root.setLevel(LOG_LEVEL)
+    _root.propagate = False
+
+
+class EventLogger:
+    # log.info("scan.cache_hit", hit_rate=0.4) -> one JSON line with the request id
+    def __init__(self, name):
+        self.logger = logging.getLogger(f"aarogya.{name}")
+
+    def _log(self, level, event, fields, exc_info=False):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+
+def get_logger(name):
+    return EventLogger(name)
+
+
+log = get_logger("http")
+
+
+def current_route():
+    context = _request.get()
+    return context["route"] if context is not None else ""
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.labels(route=current_route(), stage=stage).observe(seconds)
+    context = _request.get()
+    if context is not None:
+        context["stages"][stage] = round(context["stages"].get(stage, 0.0) + seconds, 4)
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def llm_call(model):
+    # The "upstream" stage of the current request, plus per-model latency and outcome
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        seconds = time.perf_counter() - start
+        observe_stage("upstream", seconds)
+        LLM_SECONDS.labels(model=model).observe(seconds)
+        LLM_CALLS.labels(model=model, outcome=outcome).inc()
+
+
+def record_usage(model, completion):
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return
+    # Whisper responses may carry usage without token counts
+    prompt = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt)
+    LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
+    context = _request.get()
+    if context is not None:
+        tokens = context["tokens"]
+        tokens["prompt"] = tokens.get("prompt", 0) + prompt
+        tokens["completion"] = tokens.get("completion", 0) + completion_tokens
+
+
+def render_metrics():
+    return generate_latest()
+
+
+def bind_context(fn):
+    # For work handed to a thread pool: run fn inside the submitting request's context
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def instrument(app, request, is_async=False):
+    # Request id, latency/count metrics and one summary log line per request.
+    # Works for Flask and Quart; Quart hooks must be coroutines so the context
+    # variable is set on the request's own task rather than in a worker thread.
+    def start():
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        _request.set({
+            "id": request.headers.get("X-Request-ID") or uuid.uuid4().hex,
+            "route": route,
+            "start": time.perf_counter(),
+            "stages": {},
+            "tokens": {},
+        })
+
+    def finish(response):
+        context = _request.get()
+        if context is None:
+            return response
+        seconds = time.perf_counter() - context["start"]
+        REQUESTS.labels(route=context["route"], method=request.method, status=response.status_code).inc()
+        REQUEST_SECONDS.labels(route=context["route"]).observe(seconds)
+        response.headers["X-Request-ID"] = context["id"]
+        level = log.debug if context["route"] == "/metrics" else log.info
+        level("request", method=request.method, status=response.status_code, seconds=round(seconds, 4),
+              stages=context["stages"], tokens=context["tokens"] or None)
+        return response
+
+    def reset(exc=None):
+        _request.set(None)
+
+    if is_async:
+        async def start_async():
+            start()
+
+        async def finish_async(response):
+            return finish(response)
+
+        async def reset_async(exc=None):
+            reset(exc)
+
+        app.before_request(start_async)
+        app.after_request(finish_async)
+        app.teardown_request(reset_async)
+    else:
+        app.before_request(start)
+        app.after_request(finish)
+        app.teardown_request(reset)
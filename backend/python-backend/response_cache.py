@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from decimal import Context, Decimal
+from observability import get_logger, CACHE_LOOKUPS, CACHE_EVICTIONS, CACHE_ENTRIES
+
+MISSING = object()
+
+log = get_logger("response_cache")
+
+# "70", "70 kg", "5.9ft" ... -> value in the base unit for that dimension
+_QUANTITY = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*([a-z]*)\s*$")
+_UNITS = {
+    "": "1",
+    "kg": "1", "kgs": "1", "g": "0.001", "lb": "0.45359237", "lbs": "0.45359237",
+    "cm": "1", "m": "100", "mm": "0.1", "in": "2.54", "inch": "2.54", "inches": "2.54", "ft": "30.48",
+    "yrs": "1", "years": "1", "kcal": "1",
+}
+
+_EXACT = Context(prec=100)
+_CENTS = Decimal("0.01")
+
+
+def _canonical_number(number, factor="1"):
+    # Exact decimal arithmetic, rounded to 2 places: 70 == 70.0 == "70 kg",
+    # while long numbers (phone numbers, ids) keep every digit
+    number = _EXACT.multiply(Decimal(number), Decimal(factor))
+    if not number.is_finite():
+        return str(number)
+    if number.adjusted() < _EXACT.prec - 3:  # quantize can't go wider than the precision
+        number = number.quantize(_CENTS, context=_EXACT)
+    return format(number.normalize(_EXACT), "f")
+
+
+def _canonical_value(value):
+    if isinstance(value, dict):
+        return {_canonical_text(k): _canonical_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(v) for v in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return _canonical_number(repr(value) if isinstance(value, float) else str(value))
+    text = _canonical_text(value)
+    match = _QUANTITY.match(text)
+    if match and match.group(2) in _UNITS:
+        return _canonical_number(match.group(1), _UNITS[match.group(2)])
+    return text
+
+
+def _canonical_text(value):
+    return " ".join(str(value).lower().split())
+
+
+def canonical_json(*parts):
+    # Sorted keys, case/whitespace folded, quantities converted to one unit, so
+    # {"Weight (kg)": "70"} and {"weight (kg)": "70 kg"} serialise the same
+    return json.dumps([_canonical_value(part) for part in parts], sort_keys=True, separators=(",", ":"))
+
+
+def canonical_hash(*parts):
+    return hashlib.sha256(canonical_json(*parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    # Bounded in-memory LRU with a TTL, optionally backed by a directory of
+    # JSON files so entries survive a restart. Values must be JSON-serialisable.
+    def __init__(self, name, max_entries=256, ttl_seconds=24 * 3600, disk_dir=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        CACHE_ENTRIES.labels(cache=name).set_function(lambda: len(self._entries))
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_LOOKUPS.labels(cache=self.name, result="hit").inc()
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+                CACHE_EVICTIONS.labels(cache=self.name, reason="expired").inc()
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                CACHE_LOOKUPS.labels(cache=self.name, result="miss").inc()
+                return MISSING
+            self.disk_hits += 1
+            CACHE_LOOKUPS.labels(cache=self.name, result="disk_hit").inc()
+            self._store(key, entry)
+            return entry[1]
+
+    def set(self, key, value):
+        entry = (time.time() + self.ttl_seconds, value)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+            CACHE_EVICTIONS.labels(cache=self.name, reason="evicted").inc()
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stored["expires_at"] <= now:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None
+        return stored["expires_at"], stored["value"]
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        # Write to a temp file and rename, so a crash never leaves half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": entry[0], "value": entry[1]}, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            log.warning("cache.persist_failed", cache=self.name, error=str(e))
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -1,26 +1,285 @@
+import heapq
+import json
+import os
+import threading
+import time
 import pandas as pd
+from directory_store import store
+from locality_matcher import LocalityMatcher
+from observability import get_logger
 
-def filter_hopitals(csv_file, locations):
-    # Load the CSV file
-    df = pd.read_csv(csv_file)
+BEDS_CSV = "data/updated_mumbai_hospitals.csv"
+BED_UPDATES_FILE = os.getenv("BED_UPDATES_FILE", "data/bed_updates.jsonl")  # append-only, one JSON change per line
+HOSPITAL_KEY = "_id"  # numbered in file order when the CSV has no such column
+NAME_COLUMN = "Hospital Name"
+UPDATES_POLL_SECONDS = 1.0
+
+log = get_logger("retreive_beds")
+
+
+class BedSnapshot:
+    # Immutable view of the inventory; readers keep using the snapshot they
+    # grabbed even if an update lands halfway through their request
+    def __init__(self, version, hospitals, locality_index, matcher=None, positions=None):
+        self.version = version
+        self.hospitals = hospitals  # hospital key -> record, in CSV order
+        self.records = list(hospitals.values())
+        self.locality_index = locality_index  # lowercased location -> hospital keys
+        # Shared between snapshots as long as no hospital moves or is added
+        self.matcher = matcher or LocalityMatcher(locality_index)
+        self.positions = positions or build_position_index(self.records)
+
+    def filter(self, locations):
+        # Best locality match first, CSV order within a tier; only the matched
+        # hospitals are looked at
+        tiers = {}
+        for value, score in self.matcher.match_all(locations).items():
+            tiers.setdefault(score, []).append(self.positions[value])
+        ranked = []
+        for score in sorted(tiers, reverse=True):
+            lists = tiers[score]
+            ranked.extend(lists[0] if len(lists) == 1 else heapq.merge(*lists))
+        return [self.records[i] for i in ranked]
+
+    def to_json(self, locations):
+        return json.dumps(self.filter(locations), indent=4)  # Convert to JSON format
+
+
+def build_locality_index(hospitals):
+    index = {}
+    for key, record in hospitals.items():
+        index.setdefault(record["Location"], set()).add(key)
+    return {value: frozenset(keys) for value, keys in index.items()}
+
+
+def build_position_index(records):
+    # lowercased location -> positions of its hospitals, ascending
+    index = {}
+    for i, record in enumerate(records):
+        index.setdefault(record["Location"], []).append(i)
+    return index
+
+
+def normalize_record(record):
+    record = dict(record)
+    if "Location" in record:
+        location = record["Location"]
+        record["Location"] = "" if location is None else str(location).lower()
+    return record
+
+
+def merge_changes(hospitals, key_column, changes):
+    # Applies bed changes to a hospital key -> record mapping in place and
+    # returns the keys that were added or changed
+    changed = []
+    for change in changes:
+        key = change.get(key_column)
+        if key is None:
+            log.warning("beds.update_skipped", reason=f"no {key_column}", change=change)
+            continue
+        change = normalize_record(change)
+        previous = hospitals.get(key)
+        if previous is None:
+            if "Location" not in change:
+                log.warning("beds.update_skipped", reason="unknown hospital without a Location", change=change)
+                continue
+            hospitals[key] = change
+        else:
+            hospitals[key] = {**previous, **change}
+        changed.append(key)
+    return changed
+
+
+class BedInventory:
+    def __init__(self, csv_file, updates_file=BED_UPDATES_FILE):
+        self.csv_file = csv_file
+        self.updates_file = updates_file
+        self.key = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._offset = 0
+        self._next_poll = 0.0
+        self._snapshot = self._load()
+        self.refresh(force=True)
+
+    def _load(self):
+        df = pd.read_csv(self.csv_file)
+        self.key = HOSPITAL_KEY
+        if HOSPITAL_KEY not in df.columns:
+            # Names aren't unique, so they can't be the key
+            df.insert(0, HOSPITAL_KEY, range(1, len(df) + 1))
+        # Round-trip through JSON so records hold plain Python values (no numpy, NaN -> None)
+        records = json.loads(df.to_json(orient="records"))
+        hospitals = {}
+        for record in records:
+            record = normalize_record(record)
+            hospitals[record[self.key]] = record
+        return BedSnapshot(0, hospitals, build_locality_index(hospitals))
+
+    def snapshot(self):
+        self.refresh()
+        return self._snapshot
 
-    # Ensure all values in 'Location' and 'Specialization' are strings and fill NaNs
-    df["Location"] = df["Location"].astype(str).str.lower().fillna("")
+    def apply(self, changes):
+        # Copy-on-write: only changed records are replaced and the locality
+        # index is rebuilt only when a hospital moves or is added
+        with self._lock:
+            current = self._snapshot
+            hospitals = dict(current.hospitals)
+            changed = merge_changes(hospitals, self.key, changes)
+            reindex = any(key not in current.hospitals or current.hospitals[key]["Location"] != hospitals[key]["Location"]
+                          for key in changed)
+            if reindex:
+                self._snapshot = BedSnapshot(current.version + 1, hospitals, build_locality_index(hospitals))
+            else:
+                self._snapshot = BedSnapshot(current.version + 1, hospitals, current.locality_index, current.matcher,
+                                             current.positions)
+            return self._snapshot.version
 
-    # Convert input lists to lowercase
-    locations = [loc.lower() for loc in locations]
+    def refresh(self, force=False):
+        # Tail the change file, applying only lines appended since the last read
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return self._snapshot.version
+        if not self._refresh_lock.acquire(blocking=force):
+            return self._snapshot.version  # another request is already tailing the file
+        try:
+            self._next_poll = now + UPDATES_POLL_SECONDS
+            return self._tail()
+        finally:
+            self._refresh_lock.release()
 
-    # Use .str.contains() safely to avoid NaN errors
-    location_mask = df["Location"].apply(lambda x: any(loc in x for loc in locations) if isinstance(x, str) else False)
+    def _tail(self):
+        try:
+            size = os.path.getsize(self.updates_file)
+        except OSError:
+            return self._snapshot.version
+        if size < self._offset:
+            # The change file was truncated or rotated, start over from the CSV
+            fresh = self._load()
+            with self._lock:
+                self._snapshot = BedSnapshot(self._snapshot.version + 1, fresh.hospitals, fresh.locality_index,
+                                             fresh.matcher, fresh.positions)
+            self._offset = 0
+        if size == self._offset:
+            return self._snapshot.version
 
-    # Apply filters
-    filtered_df = df[location_mask]
+        changes = []
+        with open(self.updates_file, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written line, pick it up on the next poll
+                self._offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    changes.append(json.loads(line))
+                except ValueError:
+                    log.warning("beds.update_malformed", line=line.decode("utf-8", "replace"))
+        if changes:
+            return self.apply(changes)
+        return self._snapshot.version
 
-    return filtered_df.to_json(orient="records", indent=4)  # Convert to JSON format
+
+_inventories = {}
+_inventories_lock = threading.Lock()
+
+
+def load_inventory(csv_file=BEDS_CSV):
+    inventory = _inventories.get(csv_file)
+    if inventory is None:
+        with _inventories_lock:
+            inventory = _inventories.get(csv_file)
+            if inventory is None:
+                inventory = BedInventory(csv_file)
+                _inventories[csv_file] = inventory
+    return inventory
+
+
+def hospitals_named(hospitals, name):
+    name = str(name).strip().lower()
+    return [record for record in hospitals.values() if str(record.get(NAME_COLUMN)).strip().lower() == name]
+
+
+def hospital_key(value):
+    # Keys are integers, but JSON clients send "12" as often as 12
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    raise ValueError(f"'{HOSPITAL_KEY}' must be an integer, got {value!r}")
+
+
+def keyed_changes(changes, named, known):
+    # Every logged change carries the hospital's integer _id. A change may name
+    # the hospital instead; with several of that name its Location picks one.
+    # named(name) -> records of the hospitals with that name; known(key) -> whether
+    # that hospital exists. An unknown _id is only accepted with a Location, as a new hospital.
+    keyed = []
+    for change in changes:
+        if not isinstance(change, dict):
+            raise ValueError(f"A bed update must be a JSON object, got {change!r}")
+        if change.get(HOSPITAL_KEY) is None:
+            name = change.get(NAME_COLUMN)
+            if not name:
+                raise ValueError(f"A bed update needs '{HOSPITAL_KEY}' or '{NAME_COLUMN}': {change}")
+            matches = named(name)
+            if len(matches) > 1 and change.get("Location"):
+                location = normalize_record(change)["Location"]
+                matches = [record for record in matches if record.get("Location") == location]
+            if not matches:
+                raise ValueError(f"No hospital named '{name}'; send an '{HOSPITAL_KEY}' to add one")
+            if len(matches) > 1:
+                raise ValueError(f"{len(matches)} hospitals are named '{name}'; send its '{HOSPITAL_KEY}' "
+                                 f"or Location")
+            change = {**change, HOSPITAL_KEY: matches[0][HOSPITAL_KEY], NAME_COLUMN: matches[0][NAME_COLUMN]}
+        else:
+            change = {**change, HOSPITAL_KEY: hospital_key(change[HOSPITAL_KEY])}
+            if not known(change[HOSPITAL_KEY]) and not change.get("Location"):
+                raise ValueError(f"No hospital with '{HOSPITAL_KEY}' {change[HOSPITAL_KEY]}; "
+                                 f"send a Location to add one")
+        keyed.append(change)
+    return keyed
+
+
+def append_changes(updates_file, changes):
+    with open(updates_file, "a", encoding="utf-8") as f:
+        for change in changes:
+            f.write(json.dumps(change) + "\n")
+
+
+def update_beds(changes, csv_file=BEDS_CSV):
+    # Changes go through the append-only file so every process sees them
+    # ValueError, before anything is written, for a change that doesn't identify one hospital
+    if isinstance(changes, dict):
+        changes = [changes]
+    if store.source("beds") == os.path.abspath(csv_file):
+        # The change file stays the log the next ingest replays; the store is updated in place
+        changes = keyed_changes(changes, store.hospitals_named, store.has_hospital)
+        append_changes(BED_UPDATES_FILE, changes)
+        return store.apply_hospital_changes(changes, merge_changes)
+    inventory = load_inventory(csv_file)
+    hospitals = inventory.snapshot().hospitals
+    changes = keyed_changes(changes, lambda name: hospitals_named(hospitals, name), hospitals.__contains__)
+    append_changes(inventory.updates_file, changes)
+    return inventory.refresh(force=True)
+
+
+def filter_hopitals(csv_file, locations):
+    return load_inventory(csv_file).snapshot().to_json(locations)
+
+def open_beds():
+    # Nothing to load when the beds were ingested into the directory store
+    if store.source("beds"):
+        return store
+    return load_inventory().snapshot()
 
 def get_beds(locations):
-    csv_file = "data/updated_mumbai_hospitals.csv"  # Replace with your actual file
-    return filter_hopitals(csv_file, locations)
+    if store.source("beds"):
+        return store.hospitals_json(locations)
+    return filter_hopitals(BEDS_CSV, locations)
 
 if __name__ == "__main__":
     # csv_file = "data/mh_hospitals_beds.csv"  # Replace with your actual file
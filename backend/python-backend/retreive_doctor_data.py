@@ -1,29 +1,248 @@
+import json
+import os
+import threading
+import time
 import pandas as pd
+from doctor_cards import profile_key, experience_years, fee_amount, EXPERIENCE_YEARS, FEE_AMOUNT
+from directory_store import store
+from locality_matcher import LocalityMatcher, MAX_CACHED_QUERIES
+from doctor_results import Candidate, DOCTOR_PAGE_SIZE, doctor_page
+from observability import get_logger
 
-def filter_doctors(csv_file, locations, specializations):
-    # Load the CSV file
+DOCTORS_CSV = "data/mumbai_doctors_data.csv"
+KEY_COLUMN = "Profile Link"
+DIRECTORY_POLL_SECONDS = 2.0  # how often a request checks the files for a newer directory
+
+log = get_logger("retreive_doctor_data")
+
+
+def updates_file_for(csv_file):
+    # Append-only JSON lines of upserted doctors next to the base CSV
+    return os.path.splitext(csv_file)[0] + "_updates.jsonl"
+
+
+def read_updates(updates_file):
+    rows = []
+    if os.path.exists(updates_file):
+        with open(updates_file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # torn last line from a writer that crashed
+    return rows
+
+
+def read_doctors(csv_file, updates_file=None):
+    # The base CSV with every upsert applied: one row per profile, holding its
+    # latest values at the place it first appeared, as the store's upsert does
     df = pd.read_csv(csv_file)
+    updates = read_updates(updates_file or updates_file_for(csv_file))
+    if updates:
+        # Columns the CSV lacks but a newer scrape has are kept, empty for older rows
+        df = pd.concat([df, pd.DataFrame(updates)], ignore_index=True)
+    if KEY_COLUMN in df.columns:
+        keys = df[KEY_COLUMN].map(profile_key)
+        order = pd.Series(df.index, index=df.index)
+        first = order.groupby(keys).transform("min").fillna(order)
+        latest = keys.isna() | ~keys.duplicated(keep="last")
+        df = df[latest].iloc[first[latest].argsort(kind="stable")].reset_index(drop=True)
+    return df
+
+
+def build_index(column):
+    # Map every distinct (lowercased) value to the row positions holding it
+    index = {}
+    for position, value in enumerate(column):
+        index.setdefault(value, []).append(position)
+    return {value: frozenset(rows) for value, rows in index.items()}
+
+
+def add_numeric_columns(df):
+    # "29 years experience overall" -> 29, "₹500" -> 500, so lookups can sort on them
+    for column, source, parse in ((EXPERIENCE_YEARS, "Experience", experience_years),
+                                  (FEE_AMOUNT, "Consultation Fee", fee_amount)):
+        values = df[source].map(parse) if source in df.columns else [None] * len(df)
+        df[column] = pd.Series(values, index=df.index, dtype="object").astype("Int64")
+
+
+class DoctorDirectory:
+    def __init__(self, df):
+        # Same normalisation the per-request filter used to do, done once
+        df["Location"] = df["Location"].astype(str).str.lower().fillna("")
+        df["Specialization"] = df["Specialization"].astype(str).str.lower().fillna("")
+
+        self.location_index = build_index(df["Location"])
+        self.specialization_index = build_index(df["Specialization"])
+        self.location_matcher = LocalityMatcher(self.location_index)
+        self.locations = list(df["Location"])
+        add_numeric_columns(df)
+        self.experience = [None if pd.isna(v) else int(v) for v in df[EXPERIENCE_YEARS]]
+        self.fee = [None if pd.isna(v) else int(v) for v in df[FEE_AMOUNT]]
+
+        for column in ("Location", "Specialization", "City"):
+            if column in df.columns:
+                df[column] = df[column].astype("category")
+        self.df = df
+
+        self._specialization_matches = {}
+        self._candidates = {}
+
+    @classmethod
+    def from_csv(cls, csv_file, updates_file=None):
+        return cls(read_doctors(csv_file, updates_file))
+
+    def records(self):
+        # Plain JSON values, the same records filter() returns
+        return json.loads(self.df.to_json(orient="records"))
 
-    # Ensure all values in 'Location' and 'Specialization' are strings and fill NaNs
-    df["Location"] = df["Location"].astype(str).str.lower().fillna("")
-    df["Specialization"] = df["Specialization"].astype(str).str.lower().fillna("")
+    def _match(self, index, cache, term):
+        # Substring semantics ("gynecologist" matches "gynecologist/obstetrician"),
+        # but the scan runs over the distinct values instead of every row
+        rows = cache.get(term)
+        if rows is None:
+            rows = frozenset().union(*(ids for value, ids in index.items() if term in value))
+            cache[term] = rows
+        return rows
 
-    # Convert input lists to lowercase
-    locations = [loc.lower() for loc in locations]
-    specializations = [spec.lower() for spec in specializations]
+    def match_locations(self, locations):
+        # [(score, rows)] best locality match first; every row has one
+        # locality, so the tiers don't overlap
+        tiers = {}
+        for value, score in self.location_matcher.match_all(locations).items():
+            tiers.setdefault(score, []).append(self.location_index[value])
+        return [(score, frozenset().union(*tiers[score])) for score in sorted(tiers, reverse=True)]
 
-    # Use .str.contains() safely to avoid NaN errors
-    location_mask = df["Location"].apply(lambda x: any(loc in x for loc in locations) if isinstance(x, str) else False)
-    specialization_mask = df["Specialization"].apply(lambda x: any(spec in x for spec in specializations) if isinstance(x, str) else False)
+    def match_specializations(self, specializations):
+        rows = set()
+        for spec in specializations:
+            rows |= self._match(self.specialization_index, self._specialization_matches, spec.lower())
+        return rows
 
-    # Apply filters
-    filtered_df = df[location_mask & specialization_mask]
+    def candidates(self, locations, specializations):
+        # Every match with its sort fields, memoised per query; pages are cut from it
+        query = (tuple(locations), tuple(specializations))
+        candidates = self._candidates.get(query)
+        if candidates is None:
+            specialization_rows = self.match_specializations(specializations)
+            candidates = [Candidate(row, row, score, self.experience[row], self.fee[row], self.locations[row])
+                          for score, rows in self.match_locations(locations) for row in rows & specialization_rows]
+            if len(self._candidates) >= MAX_CACHED_QUERIES:
+                self._candidates.clear()
+            self._candidates[query] = candidates
+        return candidates
 
-    return filtered_df.to_json(orient="records", indent=4)  # Convert to JSON format
+    def load(self, rows):
+        return json.loads(self.df.iloc[rows].to_json(orient="records"))
+
+    def filter(self, locations, specializations):
+        specialization_rows = self.match_specializations(specializations)
+        # Best locality match first, directory order within a tier
+        positions = []
+        for _, rows in self.match_locations(locations):
+            positions.extend(sorted(rows & specialization_rows))
+        filtered_df = self.df.iloc[positions]
+        return filtered_df.to_json(orient="records", indent=4)  # Convert to JSON format
+
+
+_directories = {}  # csv_file -> (directory, file signature, next check)
+_directories_lock = threading.Lock()
+
+
+def _signature(csv_file):
+    signature = []
+    for path in (csv_file, updates_file_for(csv_file)):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def load_directory(csv_file=DOCTORS_CSV):
+    # Built once per process and shared by every request; rebuilt when the CSV
+    # or its upserts file changes (checked at most every DIRECTORY_POLL_SECONDS)
+    entry = _directories.get(csv_file)
+    if entry is not None and time.monotonic() < entry[2]:
+        return entry[0]
+    with _directories_lock:
+        entry = _directories.get(csv_file)
+        now = time.monotonic()
+        if entry is not None and now < entry[2]:
+            return entry[0]
+        signature = _signature(csv_file)
+        if entry is not None and entry[1] == signature:
+            directory = entry[0]
+        else:
+            directory = DoctorDirectory.from_csv(csv_file)
+            if entry is not None:
+                log.info("doctors.directory_reloaded", doctors=len(directory.df))
+        _directories[csv_file] = (directory, signature, now + DIRECTORY_POLL_SECONDS)
+    return directory
+
+
+def upsert_doctors(rows, csv_file=DOCTORS_CSV):
+    # Only the new or changed doctors are written; every process picks them up
+    # on its next directory check
+    if not rows:
+        return 0
+    with open(updates_file_for(csv_file), "a", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    with _directories_lock:
+        _directories.pop(csv_file, None)
+    if store.source("doctors") == os.path.abspath(csv_file):
+        store.upsert_doctors([store_record(row) for row in rows])
+    return len(rows)
+
+
+def store_record(row):
+    # Shaped like the records DoctorDirectory serves: the ingested columns plus
+    # any newer ones the scrape has, with Location and Specialization lowercased
+    record = {column: row.get(column) for column in json.loads(store.meta("doctor_columns"))}
+    record.update((column, value) for column, value in row.items() if column not in record)
+    for column in ("Location", "Specialization"):
+        if record.get(column) is not None:
+            record[column] = str(record[column]).lower()
+    record[EXPERIENCE_YEARS] = experience_years(row.get("Experience"))
+    record[FEE_AMOUNT] = fee_amount(row.get("Consultation Fee"))
+    return record
+
+
+def filter_doctors(csv_file, locations, specializations):
+    return load_directory(csv_file).filter(locations, specializations)
+
+def open_directory():
+    # Nothing to build when the doctors were ingested into the directory store
+    if store.source("doctors"):
+        return store
+    return load_directory()
+
+def nearby_doctors(locations):
+    # Locality matching for a lookup whose specializations aren't known yet.
+    # The directory memoises it, so the lookup that follows only has to
+    # filter by specialization. Returns how many doctors practise nearby.
+    if store.source("doctors"):
+        return None  # the store matches per query in SQLite, nothing to do ahead of it
+    return sum(len(rows) for _, rows in load_directory().match_locations(locations))
+
+def find_doctors(locations, specializations, sort="relevance", limit=DOCTOR_PAGE_SIZE, cursor=None, fields=None,
+                 origin=None):
+    # A bounded page of matches: sort by relevance, experience, fee or distance
+    # from origin, continue with the returned cursor, keep only `fields`
+    if store.source("doctors"):
+        candidates = store.doctor_candidates(locations, specializations)
+        return doctor_page(candidates, store.load_doctors, json.loads(store.meta("doctor_columns")),
+                           sort, limit, cursor, fields, origin, (locations, specializations))
+    directory = load_directory()
+    return doctor_page(directory.candidates(locations, specializations), directory.load, list(directory.df.columns),
+                       sort, limit, cursor, fields, origin, (locations, specializations))
 
 def get_doctors(locations, specializations):
-    csv_file = "data/mumbai_doctors_data.csv"  # Replace with your actual file
-    return filter_doctors(csv_file, locations, specializations)
+    if store.source("doctors"):
+        return store.doctors_json(locations, specializations)
+    return filter_doctors(DOCTORS_CSV, locations, specializations)
 
 if __name__ == "__main__":
     csv_file = "data/mumbai_doctors_data.csv"  # Replace with your actual file
@@ -0,0 +1,229 @@
+# Request parsing and response bodies shared by app.py (Flask) and
+# asgi_app.py (Quart). Both frameworks hand over werkzeug args/form/files, so
+# only awaiting the request and running the pipelines differ between the two.
+import json
+from scan_food import scan, scan_batch, combine_nutrition, SCAN_BATCH_MAX_IMAGES
+from symptoms_pipeline import analyze_symptoms
+from retreive_doctor_data import find_doctors
+from doctor_results import DOCTOR_PAGE_SIZE, split_values
+from retreive_beds import update_beds
+from uploads import Upload
+from observability import get_logger, span
+from jobs import submit, callback_url, JobQueueFull
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+NO_DESCRIPTION = "no description provided by the user"
+
+log = get_logger("routes")
+
+
+class RequestError(Exception):
+    # Answered with {"error": message} and this status instead of a 500
+    def __init__(self, message, status=400, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def error_body(e):
+    return {"error": str(e)}
+
+
+def reject(kind, message, **fields):
+    log.warning(f"{kind}.rejected", **fields)
+    raise RequestError(message)
+
+
+def json_field(kind, form, name):
+    value = form.get(name)
+    if not value:
+        reject(kind, f"No {name} provided", reason=f"no {name}")
+    return json.loads(value)  # Convert JSON string to dictionary
+
+
+def read_upload(file_storage):
+    # Read the upload once; it is passed through the pipeline in memory
+    with span("upload_read"):
+        return Upload.from_file_storage(file_storage)
+
+
+def close_uploads(args):
+    for arg in args:
+        for upload in arg if isinstance(arg, list) else [arg]:
+            if isinstance(upload, Upload):
+                upload.close()
+
+
+def diet_profile(payload):
+    if not payload:
+        raise RequestError("Invalid or missing JSON data")
+    log.debug("plan_diet.profile", profile=payload)
+    return payload
+
+
+def chat_context(payload):
+    if not payload:
+        raise RequestError("Context not found")
+    log.debug("chatbot.input", context=payload)
+    return payload
+
+
+def scan_img_input(files, form):
+    if 'image' not in files:
+        reject("scan_img", "No image file provided", reason="no image file")
+    image_file = files['image']
+    if not image_file.filename.endswith(IMAGE_EXTENSIONS):
+        reject("scan_img", "Invalid file type. Only PNG, JPG, and JPEG are allowed.",
+               reason="invalid file type", filename=image_file.filename)
+
+    description = form.get("description") or NO_DESCRIPTION
+    user_details = json_field("scan_img", form, "user_Details")
+    log.debug("scan_img.input", description=description, user_details=user_details)
+    return read_upload(image_file), description, user_details
+
+
+def scan_img_body(result):
+    return {
+        "nutritional_facts": result[0],
+        "ingredients": result[1],
+        "feedback": result[2],
+        "final_thoughts": result[3]
+    }
+
+
+def scan_img_result(image, description, user_details):
+    # Runs in the request or on the job pool; either way it closes the upload
+    with image:
+        return scan_img_body(scan(image, description, user_details))
+
+
+def scan_batch_input(files, form):
+    # Several packages from one meal: images=<file> repeated, one user_Details
+    image_files = files.getlist("images") or files.getlist("image")
+    if not image_files:
+        reject("scan_batch", "No image files provided", reason="no image files")
+    if len(image_files) > SCAN_BATCH_MAX_IMAGES:
+        reject("scan_batch", f"At most {SCAN_BATCH_MAX_IMAGES} images per batch",
+               reason="too many images", images=len(image_files))
+    invalid = [f.filename for f in image_files if not f.filename.endswith(IMAGE_EXTENSIONS)]
+    if invalid:
+        reject("scan_batch", f"Invalid file type for {invalid}. Only PNG, JPG, and JPEG are allowed.",
+               reason="invalid file type", filenames=invalid)
+
+    # One description for the whole meal, or one per image in upload order
+    descriptions = form.getlist("description")
+    if len(descriptions) == 1:
+        descriptions = descriptions * len(image_files)
+    descriptions = [d or NO_DESCRIPTION for d in descriptions]
+    descriptions += [NO_DESCRIPTION] * (len(image_files) - len(descriptions))
+
+    user_details = json_field("scan_batch", form, "user_Details")
+    with span("upload_read"):
+        images = [Upload.from_file_storage(f) for f in image_files]
+    return images, descriptions, user_details
+
+
+def scan_batch_body(images, results):
+    items = []
+    for image, result in zip(images, results):
+        if isinstance(result, Exception):
+            items.append({"filename": image.filename, "error": str(result)})
+        else:
+            items.append({"filename": image.filename, **scan_img_body(result)})
+    scanned = [item for item in items if "error" not in item]
+    with span("combine"):
+        totals = combine_nutrition(json.loads(item["nutritional_facts"]) for item in scanned)
+    log.info("scan_batch.done", images=len(items), failed=len(items) - len(scanned))
+    return {"items": items, "nutrition_totals": totals, "scanned": len(scanned), "failed": len(items) - len(scanned)}
+
+
+def scan_batch_result(images, descriptions, user_details):
+    try:
+        results = scan_batch(images, descriptions, user_details)
+    finally:
+        close_uploads([images])
+    return scan_batch_body(images, results)
+
+
+def audio_input(kind, files, **fields):
+    if 'audio' not in files:
+        reject(kind, "No audio file received", reason="no audio file")
+    audio_file = files['audio']
+    audio = read_upload(audio_file)
+    log.info(f"{kind}.received", filename=audio_file.filename, audio_bytes=audio.size, **fields)
+    return audio
+
+
+def analyze_symptoms_input(files, form):
+    user_profile = json_field("analyze_symptoms", form, "user_Details")
+    ingredients = json_field("analyze_symptoms", form, "ingredients")
+    location = form.get("location")
+    if not location:
+        reject("analyze_symptoms", "No location provided", reason="no location")
+    log.debug("analyze_symptoms.input", user_profile=user_profile, ingredients=ingredients, location=location)
+    return user_profile, ingredients, audio_input("analyze_symptoms", files), location
+
+
+def analyze_symptoms_result(user_profile, ingredients, audio, location):
+    with audio:
+        # Run the symptoms pipeline; independent stages run concurrently
+        diagnosis, severity, recommendations, doctors = analyze_symptoms(user_profile, ingredients, audio, location)
+    log.debug("analyze_symptoms.result", diagnosis=diagnosis, severity=severity)
+    return {
+        "diagnosis": diagnosis,
+        "severity": severity,
+        "recommendations": recommendations,
+        "doctors": doctors
+    }
+
+
+def start_job(kind, fn, args, form, headers):
+    # The uploads in args belong to the job from here on, or are closed if it is refused
+    try:
+        job = submit(kind, fn, *args, callback_url=callback_url(form, headers))
+    except (JobQueueFull, ValueError) as e:
+        close_uploads(args)
+        log.warning(f"{kind}.job_rejected", error=str(e))
+        if isinstance(e, JobQueueFull):
+            raise RequestError(str(e), 503, {"Retry-After": "5"})
+        raise RequestError(str(e))
+    return job
+
+
+def job_accepted(job, status_url):
+    return {"job_id": job.id, "status": job.status, "status_url": status_url}
+
+
+def apply_bed_changes(changes):
+    # A single change or a list of changes, e.g. {"_id": 42, "Available Bed Count": 12}; a hospital
+    # can also be named, {"Hospital Name": "...", "Location": "..."}, when that picks out exactly one
+    if not changes:
+        raise RequestError("Invalid or missing JSON data")
+    try:
+        version = update_beds(changes)
+    except ValueError as e:
+        raise RequestError(str(e))
+    log.info("update_beds.applied", version=version)
+    return {"version": version}
+
+
+def doctors_page(args):
+    # ?location=Kurla&specialization=Dentist&sort=fee&limit=20&fields=Doctor Name,Fee Amount
+    # &lat=19.07&lon=72.88&cursor=<next_cursor of the previous page>
+    locations = split_values(args.getlist("location"))
+    specializations = split_values(args.getlist("specialization"))
+    if not locations or not specializations:
+        raise RequestError("location and specialization are required")
+
+    origin = None
+    if args.get("lat") or args.get("lon"):
+        if not (args.get("lat") and args.get("lon")):
+            raise RequestError("lat and lon must be given together")
+        origin = (args["lat"], args["lon"])
+
+    try:
+        return find_doctors(locations, specializations, sort=args.get("sort", "relevance"),
+                            limit=args.get("limit", DOCTOR_PAGE_SIZE), cursor=args.get("cursor"),
+                            fields=args.getlist("fields"), origin=origin)
+    except ValueError as e:
+        raise RequestError(str(e))
@@ -1,14 +1,42 @@
 from pydantic import BaseModel
+import asyncio
 import base64
-from openai import OpenAI
 import os
+import re
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from uploads import as_upload
+from llm_clients import openai_client, async_openai_client, loop_semaphore
+from image_preprocess import preprocess_image, preprocess_image_async
+from response_cache import ResponseCache, canonical_json, MISSING
+from observability import get_logger, span, llm_call, record_usage, bind_context
+
+log = get_logger("scan_food")
 
 
-key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=key)
 Model = "gpt-4o-mini"
 
+# Retries, double taps and rescans of the same product send identical uploads
+scan_cache = ResponseCache(
+    "scan",
+    max_entries=int(os.getenv("SCAN_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.getenv("SCAN_CACHE_TTL", str(6 * 3600))),
+    disk_dir=os.getenv("SCAN_CACHE_DIR") or None,  # unset = memory only
+)
+
+# Vision calls in flight for batch scans, across all requests in this process
+SCAN_BATCH_CONCURRENCY = int(os.getenv("SCAN_BATCH_CONCURRENCY", "5"))
+SCAN_BATCH_MAX_IMAGES = int(os.getenv("SCAN_BATCH_MAX_IMAGES", "10"))
+
+_batch_executor = ThreadPoolExecutor(max_workers=SCAN_BATCH_CONCURRENCY, thread_name_prefix="scan-batch")
+
+# "385kcal", "0.9 g", "120mg" -> amount in grams / kcal
+_AMOUNT = re.compile(r"^[\s<>~≈]*(\d+(?:\.\d+)?)\s*([a-zµ]*)")
+_MASS_UNITS = {"g": 1.0, "gm": 1.0, "gms": 1.0, "gram": 1.0, "grams": 1.0, "kg": 1000.0,
+               "mg": 0.001, "mcg": 1e-6, "ug": 1e-6, "µg": 1e-6}
+_ENERGY_UNITS = {"kcal": 1.0, "cal": 1.0, "calories": 1.0, "kj": 1 / 4.184}
+
 
 system_message = """
 You are an expert at structured data extraction. You will be given an image of packaged food and must extract ingredients and nutritional facts in the specified format. For nutritional facts, adjust values based on the amount the user is consuming; if not mentioned, assume the entire package (per serving). Convert all values to grams (g), converting milligrams (mg) to grams where necessary.
@@ -37,17 +65,15 @@ class food_info_extraction_format(BaseModel):
     feedback: str
     final_thoughts: str
 
-# Function to encode the image
-def encode_image(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+# Function to encode the image (an Upload or a path)
+def encode_image(image):
+    return base64.b64encode(as_upload(image).getbuffer()).decode("utf-8")
 
 
-# def get_data(image_path, user_prompt, user_profile, user_diet):
-def get_data(image_path, user_prompt, user_profile):
-    base64_image = encode_image(image_path)
+def scan_request(prepared, user_prompt, user_profile):
+    base64_image = base64.b64encode(prepared.data).decode("utf-8")
 
-    completion = client.beta.chat.completions.parse(
+    return dict(
         model=Model,
         messages=[
             {
@@ -64,7 +90,7 @@ def get_data(image_path, user_prompt, user_profile):
                     },
                     {
                         "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+                        "image_url": {"url": f"data:{prepared.mime};base64,{base64_image}"},
                     },
                 ],
             }
@@ -73,10 +99,31 @@ def get_data(image_path, user_prompt, user_profile):
 
 
     )
+
+# def get_data(image_path, user_prompt, user_profile, user_diet):
+def get_data(image, user_prompt, user_profile):
+    # Downscaled, metadata-free copy: smaller upload and fewer vision tokens
+    with span("preprocess"):
+        prepared = preprocess_image(as_upload(image))
+    with span("encode"):
+        request = scan_request(prepared, user_prompt, user_profile)
+    with llm_call(Model):
+        completion = openai_client().beta.chat.completions.parse(**request)
+    record_usage(Model, completion)
     data = completion.choices[0].message.content
     # print(data)
     return data
 
+async def get_data_async(image, user_prompt, user_profile):
+    with span("preprocess"):
+        prepared = await preprocess_image_async(as_upload(image))
+    with span("encode"):
+        request = scan_request(prepared, user_prompt, user_profile)
+    with llm_call(Model):
+        completion = await async_openai_client().beta.chat.completions.parse(**request)
+    record_usage(Model, completion)
+    return completion.choices[0].message.content
+
 def clean_data(data):    
     parsed_data = json.loads(data)
     nutritional_facts = parsed_data.get("nutritional_facts", [])
@@ -97,22 +144,107 @@ def clean_data(data):
     nutritional_facts_json = json.dumps(nutritional_facts_dict, indent=2)
     return nutritional_facts_json, ingredients, feedback, final_thoughts
 
+def scan_cache_key(image_bytes, user_prompt, user_profile):
+    digest = hashlib.sha256(image_bytes)
+    digest.update(canonical_json(user_prompt, user_profile).encode("utf-8"))
+    return digest.hexdigest()
+
+def cached_scan(image, user_prompt, user_profile):
+    with span("cache_lookup"):
+        cache_key = scan_cache_key(image.getbuffer(), user_prompt, user_profile)
+        result = scan_cache.get(cache_key)
+    if result is not MISSING:
+        log.info("scan.cache_hit", **scan_cache.stats())
+    return cache_key, result
+
+def finish_scan(data, cache_key):
+    log.debug("scan.response", data=data)
+    with span("parse"):
+        nutritional_facts_json, ingredients, feedback, final_thoughts = clean_data(data)
+    log.info("scan.parsed", ingredients=len(ingredients), response_bytes=len(data))
+    result = [nutritional_facts_json, ingredients, feedback, final_thoughts]
+    scan_cache.set(cache_key, result)
+    return result
+
+def parse_amount(value):
+    match = _AMOUNT.match(str(value).lower())
+    if not match:
+        return None
+    amount, unit = float(match.group(1)), match.group(2)
+    if unit in _MASS_UNITS:
+        return amount * _MASS_UNITS[unit], "g"
+    if unit in _ENERGY_UNITS:
+        return amount * _ENERGY_UNITS[unit], "kcal"
+    if unit == "":
+        return amount, ""
+    return None
+
+def combine_nutrition(facts_dicts):
+    # Sum each nutrient across scans. A bare number takes the unit the other
+    # scans used for that nutrient; values in another dimension are skipped.
+    totals = {}
+    for facts in facts_dicts:
+        for key, value in facts.items():
+            parsed = parse_amount(value)
+            if parsed is None:
+                log.debug("scan.unparsed_amount", nutrient=key, value=value)
+                continue
+            amount, unit = parsed
+            key = key.strip().lower()
+            if key not in totals:
+                totals[key] = [amount, unit]
+                continue
+            total = totals[key]
+            if unit and total[1] and unit != total[1]:
+                log.debug("scan.unit_mismatch", nutrient=key, value=value, unit=total[1])
+                continue
+            total[0] += amount
+            total[1] = total[1] or unit
+    return {key: f"{format(round(amount, 3), 'g')}{unit}" for key, (amount, unit) in totals.items()}
+
+def scan_batch(images, user_prompts, user_profile):
+    # One scan per image, SCAN_BATCH_CONCURRENCY at a time. A failed image
+    # comes back as its exception so the rest of the batch still returns.
+    futures = [_batch_executor.submit(bind_context(scan), image, prompt, user_profile)
+               for image, prompt in zip(images, user_prompts)]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            log.exception("scan.batch_item_failed")
+            results.append(e)
+    return results
+
+async def scan_batch_async(images, user_prompts, user_profile):
+    semaphore = loop_semaphore("scan_batch", SCAN_BATCH_CONCURRENCY)
+
+    async def one(image, prompt):
+        async with semaphore:
+            return await scan_async(image, prompt, user_profile)
+
+    return await asyncio.gather(*(one(image, prompt) for image, prompt in zip(images, user_prompts)),
+                                return_exceptions=True)
+
 # def scan(image_path, user_prompt, user_profile, user_diet):
-def scan(image_path, user_prompt, user_profile):
-    data = get_data(image_path, user_prompt, user_profile)
-    print(data)
-    print("\n"*10)
-    nutritional_facts_json, ingredients, feedback, final_thoughts = clean_data(data)
-    print("Nutritional Facts")
-    print(nutritional_facts_json)
-    print("Ingredients")
-    print(ingredients)
-    print("Feedback")
-    print(feedback)
-    print("final_thoughts")
-    print(final_thoughts)
-    print("\n"*10)
-    return [nutritional_facts_json, ingredients, feedback, final_thoughts]
+def scan(image, user_prompt, user_profile):
+    image = as_upload(image)
+    log.info("scan.start", image_bytes=image.size, spilled=image.spilled)
+    cache_key, result = cached_scan(image, user_prompt, user_profile)
+    if result is not MISSING:
+        return result
+
+    data = get_data(image, user_prompt, user_profile)
+    return finish_scan(data, cache_key)
+
+async def scan_async(image, user_prompt, user_profile):
+    image = as_upload(image)
+    cache_key, result = cached_scan(image, user_prompt, user_profile)
+    if result is not MISSING:
+        return result
+
+    data = await get_data_async(image, user_prompt, user_profile)
+    return finish_scan(data, cache_key)
     
 
 
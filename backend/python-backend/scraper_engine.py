@@ -0,0 +1,400 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import time
+import httpx
+from doctor_cards import profile_key
+from retreive_doctor_data import read_doctors, upsert_doctors, KEY_COLUMN
+
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "4"))
+SCRAPE_RATE = float(os.getenv("SCRAPE_RATE", "1.0"))  # pages per second, across all workers
+SCRAPE_BURST = int(os.getenv("SCRAPE_BURST", "3"))
+SCRAPE_RETRIES = int(os.getenv("SCRAPE_RETRIES", "5"))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "10"))
+# Unchanged pages in a row that end a delta crawl. More than one, because the
+# listing order shifts: a doctor who moved or changed can turn up a few pages
+# after an unchanged one.
+DELTA_STOP_AFTER = int(os.getenv("DELTA_STOP_AFTER", "5"))
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+class TokenBucket:
+    # `rate` tokens per second, up to `burst` saved up; acquire() waits for one
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Checkpoint:
+    # Append-only JSON lines: {"page": n, "links": [...]} per finished page and
+    # {"end": n} once the listing runs out. Replaying the file gives the pages
+    # still to fetch and the profiles already written, without rewriting it per page.
+    def __init__(self, path):
+        self.path = path
+        self.done_pages = set()
+        self.seen = set()
+        self.end_page = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    if "end" in entry:
+                        self.end_page = entry["end"]
+                    else:
+                        self.done_pages.add(entry["page"])
+                        self.seen.update(entry.get("links", []))
+
+    @property
+    def next_page(self):
+        page = 1
+        while page in self.done_pages:
+            page += 1
+        return page
+
+    def _append(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def page_done(self, page, links):
+        self.done_pages.add(page)
+        self.seen.update(links)
+        self._append({"page": page, "links": links})
+
+    def finished(self, end_page):
+        self.end_page = end_page
+        self._append({"end": end_page})
+
+
+class CsvAppender:
+    # Rows are appended as they arrive; the header is written only for a new file.
+    # An existing file keeps its own columns: scraped fields it lacks are left out,
+    # and a file with columns the scraper doesn't produce is refused.
+    def __init__(self, path, fields):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            with open(path, newline="", encoding="utf-8") as f:
+                header = next(csv.reader(f), [])
+            unknown = [column for column in header if column not in fields]
+            if unknown:
+                raise ValueError(f"{path} has columns {unknown} this scraper doesn't fill; "
+                                 f"pass a different --output")
+            fields = header
+        self.fields = fields
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=fields, extrasaction="ignore")
+        if new:
+            self._writer.writeheader()
+
+    def append(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def existing_links(csv_file, column="Profile Link"):
+    if not os.path.exists(csv_file):
+        return set()
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        return {profile_key(row.get(column)) for row in csv.DictReader(f)} - {None}
+
+
+async def fetch(client, url, bucket, retries=SCRAPE_RETRIES, headers=None):
+    # None for a page that doesn't exist (404); raises once retries run out.
+    # With conditional headers, a 304 response is returned as is.
+    for attempt in range(1, retries + 1):
+        await bucket.acquire()
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            error = str(e)
+        else:
+            if response.status_code in (200, 304):
+                return response
+            if response.status_code == 404:
+                return None
+            error = f"status {response.status_code}"
+            if response.status_code < 500 and response.status_code != 429:
+                break
+        print(f"Error fetching {url} (attempt {attempt}/{retries}): {error}")
+        if attempt < retries:
+            await asyncio.sleep(min(30, 2 ** attempt) + random.random())
+    raise RuntimeError(f"Giving up on {url}: {error}")
+
+
+async def crawl(base_url, extract, output_csv, fields, checkpoint_path=None, workers=SCRAPE_WORKERS,
+                rate=SCRAPE_RATE, burst=SCRAPE_BURST, max_pages=None, headers=HEADERS):
+    # Fetches base_url.format(page) for page = 1, 2, ... with `workers` requests
+    # in flight, never faster than `rate` pages/s, until a page has no cards.
+    # extract(html) -> list of row dicts. Rows go straight to output_csv, and
+    # a rerun with the same checkpoint resumes where the last run stopped.
+    checkpoint = Checkpoint(checkpoint_path or output_csv + ".checkpoint.jsonl")
+    if checkpoint.end_page is not None:
+        print(f"Crawl already finished at page {checkpoint.end_page}; delete {checkpoint.path} to start over")
+        return 0
+
+    seen = checkpoint.seen | existing_links(output_csv)
+    out = CsvAppender(output_csv, fields)
+    bucket = TokenBucket(rate, burst)
+    state = {"next": checkpoint.next_page, "end": None, "rows": 0, "failed": False}
+    if state["next"] > 1:
+        print(f"Resuming at page {state['next']} with {len(seen)} doctors already saved")
+
+    def take_page():
+        # Lowest page not yet done, skipping pages a previous run already finished
+        while state["next"] in checkpoint.done_pages:
+            state["next"] += 1
+        page = state["next"]
+        if state["failed"] or (state["end"] is not None and page >= state["end"]) \
+                or (max_pages is not None and page > max_pages):
+            return None
+        state["next"] += 1
+        return page
+
+    async def worker(client):
+        while (page := take_page()) is not None:
+            response = await fetch(client, base_url.format(page), bucket)
+            rows = await asyncio.to_thread(extract, response.text) if response is not None else []
+            if not rows:
+                # Listing ran out; pages after this one are not fetched (or are dropped)
+                state["end"] = page if state["end"] is None else min(state["end"], page)
+                print(f"No more doctor cards found on page {page}.")
+                continue
+            if state["end"] is not None and page > state["end"]:
+                continue
+
+            fresh = []
+            for row in rows:
+                key = profile_key(row.get("Profile Link"))
+                if key is None or key not in seen:
+                    fresh.append(row)
+                    if key is not None:
+                        seen.add(key)
+            out.append(fresh)
+            checkpoint.page_done(page, [profile_key(row.get("Profile Link")) for row in fresh
+                                        if row.get("Profile Link")])
+            state["rows"] += len(fresh)
+            print(f"Page {page}: {len(rows)} cards, {len(fresh)} new")
+
+    async def guarded(client):
+        try:
+            await worker(client)
+        except Exception as e:
+            state["failed"] = True  # other workers finish their page and stop
+            print(f"Crawl stopped: {e}")
+
+    try:
+        async with httpx.AsyncClient(headers=headers, timeout=SCRAPE_TIMEOUT, follow_redirects=True) as client:
+            await asyncio.gather(*(guarded(client) for _ in range(workers)))
+    finally:
+        out.close()
+
+    if state["end"] is not None and not state["failed"]:
+        checkpoint.finished(state["end"])
+    print(f"Crawl {'stopped early' if state['failed'] else 'finished'}: {state['rows']} rows written to {output_csv}")
+    return state["rows"]
+
+
+class PageValidators:
+    # ETag / Last-Modified per listing page from the previous crawl, so an
+    # unchanged page costs a 304 instead of a download and a parse
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.pages = json.load(f)
+
+    def headers(self, page):
+        saved = self.pages.get(str(page), {})
+        headers = {}
+        if saved.get("etag"):
+            headers["If-None-Match"] = saved["etag"]
+        if saved.get("last_modified"):
+            headers["If-Modified-Since"] = saved["last_modified"]
+        return headers
+
+    def update(self, page, response):
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.pages[str(page)] = {"etag": etag, "last_modified": last_modified}
+        else:
+            self.pages.pop(str(page), None)
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.pages, f)
+        os.replace(tmp, self.path)
+
+
+def row_signature(row, columns):
+    # What a stored doctor looks like, ignoring the volatile profile link query
+    values = []
+    for column in columns:
+        value = row.get(column)
+        if column == "Profile Link":
+            value = profile_key(value)
+        elif value is None or value != value:  # None or NaN
+            value = ""
+        values.append(str(value).strip())
+    return tuple(values)
+
+
+async def delta_crawl(base_url, extract, known, columns, upsert, validators_path, workers=SCRAPE_WORKERS,
+                      rate=SCRAPE_RATE, burst=SCRAPE_BURST, stop_after=DELTA_STOP_AFTER, max_pages=None,
+                      headers=HEADERS):
+    # Refreshes an existing directory. known maps profile_key -> stored row, and
+    # only rows that are new or differ in `columns` are passed to upsert(rows),
+    # with every field the page had. Pages are requested conditionally, and the
+    # crawl stops once `stop_after` consecutive pages are unchanged (a 304, or
+    # only known, unchanged doctors) or the listing runs out.
+    validators = PageValidators(validators_path)
+    signatures = {key: row_signature(row, columns) for key, row in known.items()}
+    bucket = TokenBucket(rate, burst)
+    state = {"next": 1, "stop": None, "failed": False, "fetched": 0, "not_modified": 0, "upserted": 0}
+    unchanged = set()
+    seen = set()
+
+    def take_page():
+        page = state["next"]
+        if state["failed"] or (state["stop"] is not None and page > state["stop"]) \
+                or (max_pages is not None and page > max_pages):
+            return None
+        state["next"] += 1
+        return page
+
+    def mark_unchanged(page):
+        unchanged.add(page)
+        for last in range(page, page + stop_after):
+            first = last - stop_after + 1
+            if first >= 1 and all(p in unchanged for p in range(first, last + 1)):
+                if state["stop"] is None or last < state["stop"]:
+                    state["stop"] = last
+                    print(f"Pages {first}-{last} unchanged, stopping the delta crawl")
+                return
+
+    async def worker(client):
+        while (page := take_page()) is not None:
+            response = await fetch(client, base_url.format(page), bucket, headers=validators.headers(page))
+            state["fetched"] += 1
+            if response is not None and response.status_code == 304:
+                state["not_modified"] += 1
+                mark_unchanged(page)
+                continue
+            rows = await asyncio.to_thread(extract, response.text) if response is not None else []
+            if not rows:
+                state["stop"] = page if state["stop"] is None else min(state["stop"], page)
+                print(f"No more doctor cards found on page {page}.")
+                continue
+
+            changed = []
+            unkeyed = 0
+            for row in rows:
+                key = profile_key(row.get("Profile Link"))
+                if key is None:
+                    unkeyed += 1  # can't be matched to a stored doctor, or upserted
+                    continue
+                if key in seen:
+                    continue
+                seen.add(key)
+                signature = row_signature(row, columns)
+                if signatures.get(key) != signature:
+                    signatures[key] = signature
+                    changed.append(row)
+            if unkeyed:
+                print(f"Page {page}: skipped {unkeyed} cards without a usable profile link")
+            if changed:
+                state["upserted"] += upsert(changed)
+                print(f"Page {page}: {len(rows)} cards, {len(changed)} new or changed")
+            else:
+                mark_unchanged(page)
+            # Only once the page's changes are stored, so a later 304 can't hide them
+            validators.update(page, response)
+
+    async def guarded(client):
+        try:
+            await worker(client)
+        except Exception as e:
+            state["failed"] = True
+            print(f"Delta crawl stopped: {e}")
+
+    try:
+        async with httpx.AsyncClient(headers=headers, timeout=SCRAPE_TIMEOUT, follow_redirects=True) as client:
+            await asyncio.gather(*(guarded(client) for _ in range(workers)))
+    finally:
+        validators.save()
+
+    print(f"Delta crawl {'stopped early' if state['failed'] else 'finished'}: {state['fetched']} pages fetched "
+          f"({state['not_modified']} not modified), {state['upserted']} doctors upserted")
+    return state["upserted"]
+
+
+async def refresh_directory(base_url, extract, csv_file, **kwargs):
+    # Delta crawl straight into the directory retreive_doctor_data serves
+    df = read_doctors(csv_file)
+    known = {}
+    for row in df.to_dict("records"):
+        key = profile_key(row.get(KEY_COLUMN))
+        if key is not None:
+            known[key] = row
+    print(f"Refreshing {csv_file}: {len(known)} doctors known")
+    return await delta_crawl(base_url, extract, known, list(df.columns),
+                             lambda rows: upsert_doctors(rows, csv_file),
+                             csv_file + ".validators.json", **kwargs)
+
+
+def run_cli(extract, fields, base_url, output_csv, description="Scrape the Practo Mumbai doctor listing", argv=None):
+    # Command line shared by the scrapers: a full crawl (resumed from its
+    # checkpoint after a crash), or with --delta a refresh of an existing --output
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--base-url", default=base_url, help="listing URL with {} for the page number")
+    parser.add_argument("--output", default=output_csv)
+    parser.add_argument("--checkpoint", help="progress file, defaults to <output>.checkpoint.jsonl")
+    parser.add_argument("--workers", type=int, default=SCRAPE_WORKERS)
+    parser.add_argument("--rate", type=float, default=SCRAPE_RATE, help="pages per second")
+    parser.add_argument("--max-pages", type=int)
+    parser.add_argument("--delta", action="store_true",
+                        help="refresh an existing --output: upsert only new or changed doctors and stop early")
+    parser.add_argument("--stop-after", type=int, default=DELTA_STOP_AFTER,
+                        help="unchanged pages in a row that end a delta crawl; listing order shifts, so "
+                             "changes can sit a few pages past an unchanged one")
+    args = parser.parse_args(argv)
+
+    if args.delta:
+        asyncio.run(refresh_directory(args.base_url, extract, args.output, workers=args.workers,
+                                      rate=args.rate, stop_after=args.stop_after, max_pages=args.max_pages))
+    else:
+        try:
+            asyncio.run(crawl(args.base_url, extract, args.output, fields, args.checkpoint,
+                              workers=args.workers, rate=args.rate, max_pages=args.max_pages))
+        except ValueError as e:
+            parser.error(str(e))
+    return args
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from observability import get_logger, observe_stage, bind_context
+
+log = get_logger("stage_graph")
+
+
+class StageTimeout(Exception):
+    pass
+
+
+class Stage:
+    # fn is called with the results of its dependencies as keyword arguments.
+    # An optional stage that fails or times out yields `default` instead of
+    # failing the whole graph.
+    def __init__(self, name, fn, deps=(), timeout=None, optional=False, default=None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.optional = optional
+        self.default = default
+
+
+def run_stages(stages, max_workers=None):
+    # Every stage starts as soon as its dependencies are done, so the total
+    # latency is the critical path through the graph rather than the sum
+    stages = {stage.name: stage for stage in stages}
+    for stage in stages.values():
+        missing = [dep for dep in stage.deps if dep not in stages]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+
+    results = {}
+    timings = {}
+    pending = dict(stages)
+    running = {}  # future -> (stage, deadline, started)
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(stages))
+    try:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage.deps):
+                    del pending[name]
+                    kwargs = {dep: results[dep] for dep in stage.deps}
+                    started = time.monotonic()
+                    deadline = started + stage.timeout if stage.timeout else None
+                    running[executor.submit(bind_context(stage.fn), **kwargs)] = (stage, deadline, started)
+            if not running:
+                raise ValueError(f"Stages {sorted(pending)} have circular dependencies")
+
+            deadlines = [deadline for _, deadline, _ in running.values() if deadline is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            now = time.monotonic()
+            for future in list(running):
+                stage, deadline, started = running[future]
+                if future in done:
+                    del running[future]
+                    timings[stage.name] = now - started
+                    try:
+                        results[stage.name] = future.result()
+                    except Exception as e:
+                        if not stage.optional:
+                            raise
+                        log.warning("stage.failed", stage=stage.name, error=str(e))
+                        results[stage.name] = stage.default
+                elif deadline is not None and now >= deadline:
+                    # The thread can't be interrupted; its result is simply dropped
+                    del running[future]
+                    timings[stage.name] = now - started
+                    if not stage.optional:
+                        raise StageTimeout(f"Stage {stage.name} timed out after {stage.timeout}s")
+                    log.warning("stage.timed_out", stage=stage.name, timeout=stage.timeout)
+                    results[stage.name] = stage.default
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        for name, seconds in timings.items():
+            observe_stage(name, seconds)
+
+    return results
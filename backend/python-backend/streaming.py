@@ -0,0 +1,60 @@
+import json
+from observability import get_logger
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+SSE_MIMETYPE = "text/event-stream"
+
+log = get_logger("streaming")
+
+
+def stream_format(args, headers):
+    # ?stream=sse / ?stream=ndjson, or ?stream=1 with the Accept header deciding.
+    # None keeps the regular single JSON response.
+    requested = (args.get("stream") or "").lower()
+    if requested in ("", "0", "false"):
+        return None
+    if requested in ("sse", "ndjson"):
+        return requested
+    return "sse" if SSE_MIMETYPE in headers.get("Accept", "") else "ndjson"
+
+
+def mimetype(fmt):
+    return SSE_MIMETYPE if fmt == "sse" else NDJSON_MIMETYPE
+
+
+def encode_event(event, fmt):
+    payload = json.dumps(event)
+    if fmt == "sse":
+        return f"data: {payload}\n\n"
+    return payload + "\n"
+
+
+def message_events(deltas, prefix_events=()):
+    # {"delta": ...} per chunk, then {"done": true, "message": <full text>};
+    # an upstream failure mid-stream becomes a final {"error": ...} event
+    yield from prefix_events
+    parts = []
+    try:
+        for delta in deltas:
+            parts.append(delta)
+            yield {"delta": delta}
+    except Exception as e:
+        log.warning("stream.failed", error=str(e))
+        yield {"error": str(e)}
+        return
+    yield {"done": True, "message": "".join(parts)}
+
+
+async def message_events_async(deltas, prefix_events=()):
+    for event in prefix_events:
+        yield event
+    parts = []
+    try:
+        async for delta in deltas:
+            parts.append(delta)
+            yield {"delta": delta}
+    except Exception as e:
+        log.warning("stream.failed", error=str(e))
+        yield {"error": str(e)}
+        return
+    yield {"done": True, "message": "".join(parts)}
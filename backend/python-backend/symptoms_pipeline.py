@@ -0,0 +1,32 @@
+import os
+from stage_graph import Stage, run_stages
+from symptoms import symptoms_analyzer
+from audio_transciption import audio_transcriber, TranscribedAudio
+from locality_resolver import resolve_localities
+from retreive_doctor_data import nearby_doctors
+from observability import get_logger
+
+SYMPTOMS_TRANSCRIBE_TIMEOUT = float(os.getenv("SYMPTOMS_TRANSCRIBE_TIMEOUT", "60"))
+SYMPTOMS_ANALYSIS_TIMEOUT = float(os.getenv("SYMPTOMS_ANALYSIS_TIMEOUT", "90"))
+SYMPTOMS_LOOKUP_TIMEOUT = float(os.getenv("SYMPTOMS_LOOKUP_TIMEOUT", "5"))
+
+log = get_logger("symptoms_pipeline")
+
+
+def analyze_symptoms(user_profile, ingredients, audio, location):
+    # Transcription runs alongside resolving the location and matching the
+    # doctors around it; the analysis starts when both are done and is
+    # handed the transcript instead of the raw audio
+    results = run_stages([
+        Stage("transcript", lambda: audio_transcriber(audio), timeout=SYMPTOMS_TRANSCRIBE_TIMEOUT),
+        Stage("localities", lambda: resolve_localities(location),
+              timeout=SYMPTOMS_LOOKUP_TIMEOUT, optional=True, default=[]),
+        Stage("nearby_doctors", lambda localities: nearby_doctors(localities) if localities else None,
+              deps=("localities",), timeout=SYMPTOMS_LOOKUP_TIMEOUT, optional=True),
+        Stage("analysis", lambda transcript, nearby_doctors:
+              symptoms_analyzer(user_profile, ingredients, TranscribedAudio(audio, transcript), location),
+              deps=("transcript", "nearby_doctors"), timeout=SYMPTOMS_ANALYSIS_TIMEOUT),
+    ])
+    log.debug("symptoms.lookup", chars=len(results["transcript"] or ""), localities=results["localities"],
+              nearby_doctors=results["nearby_doctors"])
+    return results["analysis"]
@@ -0,0 +1,14 @@
+from response_cache import canonical_hash, canonical_json
+
+
+def test_equivalent_profiles_share_a_key():
+    assert canonical_hash({"Weight (kg)": "70"}) == canonical_hash({" weight (KG)": "70 kg"})
+    assert canonical_hash({"weight": 70}) == canonical_hash({"weight": 70.0}) == canonical_hash({"weight": "70.00"})
+    assert canonical_hash({"height": "6ft"}) == canonical_hash({"height": "182.88 cm"})
+
+
+def test_distinct_values_get_distinct_keys():
+    assert canonical_json({"phone": "9876543210"}) != canonical_json({"phone": "9876543299"})
+    assert canonical_hash({"Weight": "1234567"}) != canonical_hash({"Weight": "1234568"})
+    assert canonical_hash({"weight": 70.5}) != canonical_hash({"weight": 70.51})
+    assert canonical_hash({"id": 12345678901234567890123456789}) != canonical_hash({"id": 12345678901234567890123456788})
@@ -0,0 +1,129 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from uploads import as_upload
+from audio_preprocess import prepare_audio, split_on_silence, encode, AUDIO_FORMAT
+from llm_clients import groq_client, async_groq_client, loop_semaphore
+from response_cache import ResponseCache, MISSING
+from observability import get_logger, span, llm_call, record_usage, bind_context
+
+WHISPER_MODEL = "whisper-large-v3-turbo"
+
+# Recordings up to this long go to Whisper in one call
+TRANSCRIBE_SINGLE_SHOT_SECONDS = float(os.getenv("TRANSCRIBE_SINGLE_SHOT_SECONDS", "90"))
+TRANSCRIBE_SEGMENT_SECONDS = float(os.getenv("TRANSCRIBE_SEGMENT_SECONDS", "60"))
+TRANSCRIBE_SEARCH_SECONDS = float(os.getenv("TRANSCRIBE_SEARCH_SECONDS", "10"))  # how far to look for a pause
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+
+# Retried and resent voice notes decode to the same samples
+transcript_cache = ResponseCache(
+    "transcript",
+    max_entries=int(os.getenv("TRANSCRIPT_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("TRANSCRIPT_CACHE_TTL", str(24 * 3600))),
+    disk_dir=os.getenv("TRANSCRIPT_CACHE_DIR") or None,  # unset = memory only
+)
+
+_executor = ThreadPoolExecutor(max_workers=TRANSCRIBE_WORKERS, thread_name_prefix="transcribe")
+
+log = get_logger("transcription")
+
+
+def _whisper_request(filename, data):
+    return dict(
+      file=(filename, data),
+      model=WHISPER_MODEL,
+      response_format="verbose_json",
+    )
+
+
+def _segments(prepared):
+    # None means single-shot: short clip, or audio we couldn't decode
+    if prepared.segment is None or prepared.duration <= TRANSCRIBE_SINGLE_SHOT_SECONDS:
+        return None
+    pieces = split_on_silence(prepared.segment, int(TRANSCRIBE_SEGMENT_SECONDS * 1000),
+                              int(TRANSCRIBE_SEARCH_SECONDS * 1000))
+    log.info("transcribe.segmented", audio_seconds=round(prepared.duration, 1), segments=len(pieces))
+    return pieces
+
+
+def _segment_filename(prepared, index):
+    base = os.path.splitext(prepared.filename)[0]
+    return f"{base}-{index}.{AUDIO_FORMAT}"
+
+
+def _whisper(filename, data):
+    with llm_call(WHISPER_MODEL):
+        transcription = groq_client().audio.transcriptions.create(**_whisper_request(filename, data))
+    record_usage(WHISPER_MODEL, transcription)
+    return transcription.text
+
+
+async def _whisper_async(filename, data):
+    with llm_call(WHISPER_MODEL):
+        transcription = await async_groq_client().audio.transcriptions.create(**_whisper_request(filename, data))
+    record_usage(WHISPER_MODEL, transcription)
+    return transcription.text
+
+
+def _transcribe_segment(filename, piece):
+    return _whisper(filename, encode(piece)).strip()
+
+
+def _cached(prepared):
+    key = prepared.fingerprint()
+    text = transcript_cache.get(key)
+    if text is not MISSING:
+        log.debug("transcribe.cache_hit", **transcript_cache.stats())
+    return key, text
+
+
+def transcribe(source):
+    with span("audio_preprocess"):
+        prepared = prepare_audio(as_upload(source))
+    key, text = _cached(prepared)
+    if text is MISSING:
+        text = _transcribe(prepared)
+        transcript_cache.set(key, text)
+    return text
+
+
+def _transcribe(prepared):
+    pieces = _segments(prepared)
+    if pieces is None:
+        data = prepared.data  # before .filename, which depends on whether encoding worked
+        return _whisper(prepared.filename, data)
+
+    # Futures in segment order, so the text stitches back in sequence; each
+    # segment gets its own copy of the request context for the upstream metrics
+    futures = [_executor.submit(bind_context(_transcribe_segment), _segment_filename(prepared, i), piece)
+               for i, piece in enumerate(pieces)]
+    return " ".join(future.result() for future in futures)
+
+
+async def _transcribe_segment_async(filename, piece):
+    async with loop_semaphore("transcribe", TRANSCRIBE_WORKERS):
+        data = await asyncio.to_thread(encode, piece)
+        return (await _whisper_async(filename, data)).strip()
+
+
+async def transcribe_async(source):
+    # Decoding and re-encoding shell out to ffmpeg, keep that off the event loop
+    with span("audio_preprocess"):
+        prepared = await asyncio.to_thread(prepare_audio, as_upload(source))
+    key, text = await asyncio.to_thread(_cached, prepared)
+    if text is MISSING:
+        text = await _transcribe_async(prepared)
+        transcript_cache.set(key, text)
+    return text
+
+
+async def _transcribe_async(prepared):
+    pieces = _segments(prepared)
+    if pieces is None:
+        data = await asyncio.to_thread(lambda: prepared.data)
+        return await _whisper_async(prepared.filename, data)
+
+    texts = await asyncio.gather(*(
+        _transcribe_segment_async(_segment_filename(prepared, i), piece) for i, piece in enumerate(pieces)
+    ))
+    return " ".join(texts)
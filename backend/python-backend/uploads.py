@@ -0,0 +1,103 @@
+import mmap
+import os
+import tempfile
+
+# Uploads larger than this are spilled to an anonymous temp file instead of RAM
+UPLOAD_SPILL_BYTES = int(os.getenv("UPLOAD_SPILL_BYTES", str(16 * 1024 * 1024)))
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+class Upload:
+    # An uploaded file read exactly once from the request. Small uploads stay
+    # in memory; large ones live in an unnamed temp file that disappears on
+    # close, so nothing user-named ever lands on disk.
+    def __init__(self, filename, data=None, spool=None, content_type=None):
+        self.filename = filename
+        self.content_type = content_type
+        self._data = data
+        self._spool = spool
+        self._mmap = None
+        self.size = len(data) if data is not None else os.fstat(spool.fileno()).st_size
+
+    @classmethod
+    def from_file_storage(cls, file_storage, spill_bytes=UPLOAD_SPILL_BYTES):
+        return cls.from_stream(file_storage.stream, file_storage.filename,
+                               file_storage.mimetype, spill_bytes)
+
+    @classmethod
+    def from_stream(cls, stream, filename, content_type=None, spill_bytes=UPLOAD_SPILL_BYTES):
+        chunks = []
+        size = 0
+        spool = None
+        while True:
+            chunk = stream.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            if spool is None:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > spill_bytes:
+                    spool = tempfile.TemporaryFile()
+                    spool.writelines(chunks)
+                    chunks = None
+            else:
+                spool.write(chunk)
+        if spool is None:
+            return cls(filename, data=b"".join(chunks), content_type=content_type)
+        spool.flush()
+        return cls(filename, spool=spool, content_type=content_type)
+
+    @classmethod
+    def from_path(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_stream(f, os.path.basename(path))
+
+    @property
+    def spilled(self):
+        return self._spool is not None
+
+    def getbuffer(self):
+        # Zero-copy view of the contents (memory-mapped when spilled)
+        if self._data is not None:
+            return memoryview(self._data)
+        if self._mmap is None:
+            if self.size == 0:
+                return memoryview(b"")
+            self._mmap = mmap.mmap(self._spool.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def payload(self):
+        # What to hand to an SDK file parameter: the bytes themselves, or the
+        # temp file rewound to the start
+        if self._data is not None:
+            return self._data
+        self._spool.seek(0)
+        return self._spool
+
+    def read(self):
+        if self._data is not None:
+            return self._data
+        return bytes(self.getbuffer())
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # a view is still alive, the map is released when it is collected
+            self._mmap = None
+        if self._spool is not None:
+            self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def as_upload(source):
+    # Pipelines accept either an Upload or, for scripts and tests, a file path
+    if isinstance(source, Upload):
+        return source
+    return Upload.from_path(source)